@@ -0,0 +1,217 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Solves a stream of positions, one JSON object per line, and writes one JSON object per line with the
+# moves found for each, in the same order. A position looks like
+#
+#	{"id": 1, "tiles": [[7, 7, "a"], [8, 7, "t"]], "rack": "aerst*u"}
+#
+# where "id" is optional and copied to the result, and an optional "rules" object can override
+# "height", "width", "bingo_bonus", "letter_points" or "bonus_placements" (a list of [x, y, bonus]).
+# With a dictionary of several lexicons, an optional "lexicon" names the lexicon, or a list of them,
+# whose words can be played.
+# The result holds the top moves, or an "error" if the position could not be solved:
+#
+#	{"id": 1, "moves": [{"word": "tears", "score": 12, "direction": "across", "start": [4, 8], "blanks": []}]}
+#
+# The positions are shared out to a pool of worker processes, each of which loads the dictionary once.
+# Only a bounded number of positions are in flight at a time, so memory use does not grow with the
+# size of the input. The throughput is reported on stderr.
+#
+# Usage: python batch_solver.py [positions.jsonl] [--output results.jsonl] [--workers N] [--top K]
+#	[--all] [--all-blanks] [--dictionary file] [--engine dawg|gaddag] [--gaddag file] [--leaves file]
+#	[--stats] [--cache-moves N] [--cache-file file]
+#
+# With --stats, each result also has the "stats" of solving it: the search counters and the seconds
+# spent in each phase (see SearchStats), and whether its moves were "cached".
+#
+# With --cache-moves or --cache-file, each worker keeps the moves of the positions it solves in a
+# MoveCache of up to N moves (see position_cache), so a position that comes up again is answered
+# without being searched. With --cache-file the moves are also stored in that file, which the workers
+# share and which is kept for later runs.
+#
+# With a leave table, each move also has the "leave" value of the tiles it keeps, and the top moves are
+# those with the highest score plus leave value.
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+from helper_lists import *
+from scrabble_solver_game import Game, DAWG_ENGINE, GADDAG_ENGINE
+from leaves import LeaveTable
+from position_cache import DEFAULT_MAX_MOVES, MoveCache, cache_key, position_hash, search_options
+from solver_helper_classes import Dictionary, SearchStats
+
+# The dictionary loaded by each worker process, and how the worker solves positions
+worker_dictionary = None
+worker_options = None
+
+# The leave table loaded by each worker process, if any
+worker_leave_table = None
+
+# The MoveCache of each worker process, if any
+worker_cache = None
+
+# Loads the dictionary for a worker. Building a dictionary from a word list prints its build stats,
+# which would otherwise end up in the results.
+def init_worker(dictionary_file, options):
+	global worker_dictionary, worker_options, worker_leave_table, worker_cache
+	with contextlib.redirect_stdout(sys.stderr):
+		worker_dictionary = Dictionary(dictionary_file, gaddag_file=options["gaddag_file"])
+		if options["engine"] == GADDAG_ENGINE:
+			worker_dictionary.get_gaddag()
+	worker_leave_table = LeaveTable(options["leave_file"]) if options["leave_file"] else None
+	worker_options = options
+	worker_cache = None
+	if options["cache_moves"] is not None or options["cache_file"] is not None:
+		worker_cache = MoveCache(DEFAULT_MAX_MOVES if options["cache_moves"] is None else options["cache_moves"], path=options["cache_file"])
+
+# Returns the height, width, tiles, bonus placements, letter points, rack and bingo bonus of a position
+# read from the input, the arguments Game takes for them
+def position_args(position):
+	rules = position.get("rules", {})
+	bonus_placements = SCRABBLE_BONUS_PLACEMENTS
+	if "bonus_placements" in rules:
+		bonus_placements = {(x, y): bonus for x, y, bonus in rules["bonus_placements"]}
+
+	tiles = {(x, y): letter for x, y, letter in position.get("tiles", [])}
+	return (rules.get("height", SCRABBLE_HEIGHT), rules.get("width", SCRABBLE_WIDTH), tiles, bonus_placements,
+		rules.get("letter_points", SCRABBLE_LETTER_POINTS), list(position["rack"]), rules.get("bingo_bonus", SCRABBLE_BINGO_BONUS))
+
+# Returns the Game for a position read from the input
+def position_game(position, dictionary, leave_table=None):
+	height, width, tiles, bonus_placements, letter_points, rack, bingo_bonus = position_args(position)
+	return Game(height, width, tiles, bonus_placements, letter_points, rack, bingo_bonus, None,
+		dictionary=dictionary, leave_table=leave_table, lexicons=position.get("lexicon"))
+
+# Returns the key of a position's moves in the worker's cache, the one Game.cache_key would give
+def position_cache_key(position):
+	height, width, tiles, bonus_placements, letter_points, rack, bingo_bonus = position_args(position)
+	search = search_options(worker_options["top"], worker_options["engine"], by_equity=worker_leave_table is not None)
+	return cache_key(position_hash(height, width, tiles, bonus_placements, letter_points, bingo_bonus, rack), search,
+		worker_dictionary, worker_dictionary.lexicon_mask(position.get("lexicon")), worker_options["all_blanks"], worker_leave_table)
+
+def move_to_json(move):
+	result = {
+		"word": move.serialize(),
+		"score": move.score,
+		"direction": move.direction,
+		"start": list(move.start_coords),
+		"blanks": [i for i, move_letter in enumerate(move.letters) if move_letter.was_blank],
+	}
+	if worker_leave_table is not None:
+		result["leave"] = round(move.leave_value, 2)
+	return result
+
+# Solves one input line and returns its result line
+def solve_line(line):
+	result = {}
+	try:
+		position = json.loads(line)
+		if "id" in position:
+			result["id"] = position["id"]
+
+		key = moves = None
+		stats = SearchStats()
+		if worker_cache is not None:
+			key = position_cache_key(position)
+			moves = worker_cache.get(key)
+		cached = moves is not None
+
+		if not cached:
+			game = position_game(position, worker_dictionary, worker_leave_table)
+			game.all_blank_assignments = worker_options["all_blanks"]
+			stats = game.stats
+			if worker_options["top"] is None:
+				game.Algorithm(worker_options["engine"])
+				moves = game.possible_moves
+			else:
+				moves = game.top_moves(worker_options["top"], worker_options["engine"], by_equity=worker_leave_table is not None)
+			if key is not None:
+				worker_cache.put(key, moves)
+
+		result["moves"] = [move_to_json(move) for move in moves]
+		if worker_options["stats"]:
+			result["stats"] = stats.as_dict()
+			result["stats"]["cached"] = cached
+	except Exception as error:
+		result["error"] = "{}: {}".format(type(error).__name__, error)
+	return json.dumps(result)
+
+# Solves the positions in lines, writing the results to output in input order, with a pool of workers
+# processes, or in this process if workers is 1. At most max_in_flight positions are read ahead of
+# the last result written. Returns the number of positions solved.
+def solve_batch(lines, output, dictionary_file, workers=1, top=1, engine=DAWG_ENGINE, gaddag_file=None, max_in_flight=None, all_blanks=False, leave_file=None, stats=False, cache_moves=None, cache_file=None):
+	options = {"top": top, "engine": engine, "gaddag_file": gaddag_file, "all_blanks": all_blanks, "leave_file": leave_file, "stats": stats,
+		"cache_moves": cache_moves, "cache_file": cache_file}
+	lines = (line for line in lines if line.strip())
+	solved = 0
+
+	if workers == 1:
+		init_worker(dictionary_file, options)
+		for line in lines:
+			output.write(solve_line(line) + "\n")
+			solved += 1
+		if worker_cache is not None:
+			print("Move cache: {}".format(worker_cache), file=sys.stderr)
+		return solved
+
+	if max_in_flight is None:
+		max_in_flight = workers * 16
+
+	with multiprocessing.Pool(workers, initializer=init_worker, initargs=(dictionary_file, options)) as pool:
+		pending = deque()
+		for line in lines:
+			pending.append(pool.apply_async(solve_line, (line,)))
+			# Wait for the oldest position before reading any more
+			if len(pending) >= max_in_flight:
+				output.write(pending.popleft().get() + "\n")
+				solved += 1
+		while pending:
+			output.write(pending.popleft().get() + "\n")
+			solved += 1
+
+	return solved
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Solve scrabble positions from a JSONL file or stdin")
+	parser.add_argument("input", nargs="?", help="positions, one JSON object per line (default: stdin)")
+	parser.add_argument("--output", help="where to write the results (default: stdout)")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+	parser.add_argument("--top", type=int, default=1, help="number of highest scoring moves to keep per position")
+	parser.add_argument("--all", action="store_true", help="keep every move instead of the top ones")
+	parser.add_argument("--all-blanks", action="store_true", help="keep a move for every way of playing the blanks, not only the highest scoring")
+	parser.add_argument("--dictionary", help="word list or compiled dawg (default: {} if it exists, else {})".format(COMPILED_DICTIONARY, DICTIONARY))
+	parser.add_argument("--engine", choices=[DAWG_ENGINE, GADDAG_ENGINE], default=DAWG_ENGINE)
+	parser.add_argument("--leaves", help="leave table built with leaves.py, to rank the moves by score plus leave value")
+	parser.add_argument("--stats", action="store_true", help="add the search counters and phase times of each position to its result")
+	parser.add_argument("--cache-moves", type=int, help="keep up to this many moves of solved positions in each worker's cache (default: {} with --cache-file)".format(DEFAULT_MAX_MOVES))
+	parser.add_argument("--cache-file", help="also store the cached moves in this file, shared by the workers and kept between runs")
+	parser.add_argument("--gaddag", help="compiled GADDAG for the gaddag engine (default: {} if it exists and --dictionary is not given)".format(COMPILED_GADDAG))
+	args = parser.parse_args()
+
+	dictionary_file = args.dictionary
+	if dictionary_file is None:
+		dictionary_file = COMPILED_DICTIONARY if os.path.exists(COMPILED_DICTIONARY) else DICTIONARY
+
+	gaddag_file = args.gaddag
+	# The default GADDAG is compiled from the default dictionary, and may not hold the same lexicons as
+	# another one
+	if gaddag_file is None and args.dictionary is None and os.path.exists(COMPILED_GADDAG):
+		gaddag_file = COMPILED_GADDAG
+
+	input_file = open(args.input, "rt") if args.input else sys.stdin
+	output_file = open(args.output, "wt") if args.output else sys.stdout
+
+	start = time.perf_counter()
+	solved = solve_batch(input_file, output_file, dictionary_file, args.workers, None if args.all else args.top, args.engine, gaddag_file, all_blanks=args.all_blanks, leave_file=args.leaves, stats=args.stats,
+		cache_moves=args.cache_moves, cache_file=args.cache_file)
+	output_file.flush()
+	seconds = time.perf_counter() - start
+	print("Solved {} positions in {:.2f} s ({:.1f} positions/s)".format(solved, seconds, solved / seconds if seconds else 0), file=sys.stderr)
@@ -0,0 +1,710 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Benchmarks for the solver. Each benchmark prints its results as a table.
+#
+# Usage: python benchmark.py <benchmark> [dictionary file] [--output results.json] [--compare baseline.json]
+#	[--tolerance fraction]
+#
+#	suite				time of each phase of solving, from building the lexicon to sorting the moves,
+#						moves per second and peak memory on a corpus of positions from an empty board to
+#						a full endgame board, for racks with no, one and two blanks. The results can be
+#						saved as JSON with --output, and compared with saved results with --compare,
+#						which lists the phases that got slower by more than the tolerance (default 0.1)
+#						or found different moves, and exits with status 1 if there are any.
+#	dawg				memory use and traversal speed of Dawg next to FlatDawg
+#	cross_checks		time to evaluate the cross checks and scores of a crowded board
+#	generation			time to generate every move for full racks on sparse and crowded boards
+#	engines				the dawg and GADDAG move generators on the same positions, which must agree
+#	pruning				search nodes and time to find the best moves with and without the branch and
+#						bound search, which must find the same moves
+#	parallel			time to generate every move with 1 to N worker processes, where N is the
+#						number of cores (at least 2), which must find the same moves
+#	simulation			rollouts per second of the Monte Carlo simulation with 1 to N worker processes,
+#						which must give the same equities
+#	ingest				time and peak memory of reading a large synthetic gzipped word list into sorted
+#						distinct words, all in memory and merge sorted in chunks, which must give the
+#						same words
+#	lexicons			size and build time of a dawg for each of three lexicons that share over 90% of
+#						their words next to one dawg serving all three, which must hold the same words
+#						and give the same moves for each lexicon
+#	blanks				search nodes and time to generate every move for racks with one and two blanks,
+#						with every blank assignment and with only the highest scoring one for each
+#						placement, which must be the best of the assignments
+#	scoring				moves per second scored one at a time with score_move and all at once with
+#						score_moves, which needs NumPy, for every blank assignment of racks with one and
+#						two blanks, which must give the same scores
+#	cache				time to solve a stream of positions with repeats without a move cache, with one in
+#						memory, one that only keeps 4 move lists, one backed by a file and one that reads
+#						every list back from that file, with their hits, misses and evictions, which must
+#						all give the same moves
+
+import argparse
+import contextlib
+import copy
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from string import ascii_lowercase
+
+from dawg import peak_memory
+from flat_dawg import FlatDawg
+from gaddag import dawg_words
+from helper_lists import *
+from scrabble_solver_game import Game, DAWG_ENGINE, GADDAG_ENGINE
+from solver_helper_classes import Dictionary
+from word_lists import WordListReader, normalize_word, open_word_list
+
+# Position used by the benchmarks that generate moves
+BENCHMARK_TILES = placed_tiles
+BENCHMARK_RACK = ["a", "e", "r", "s", "t", "u", "m"]
+
+# Returns placed tiles for a list of (x, y, direction, word) placements
+def tiles_from_words(placements):
+	tiles = {}
+	for x, y, direction, word in placements:
+		for i, letter in enumerate(word):
+			if direction == "across":
+				tiles[(x + i, y)] = letter
+			else:
+				tiles[(x, y + i)] = letter
+	return tiles
+
+# A crowded mid game board, with many squares that are hooked on one or both sides
+BENCHMARK_DENSE_TILES = tiles_from_words([
+	(4, 7, "across", "after"), (8, 5, "down", "hard"), (2, 3, "down", "jester"), (2, 3, "across", "jovial"),
+	(7, 3, "down", "loaf"), (5, 10, "across", "quiz"), (6, 10, "down", "unit"), (10, 8, "across", "dowse"),
+	(14, 2, "down", "zealous"), (0, 12, "across", "ramen"), (3, 12, "down", "eve"), (11, 12, "across", "axe"),
+])
+
+# Returns placed tiles for the rows of a board, with "." for an empty square
+def tiles_from_rows(rows):
+	return {(x, y): letter for y, row in enumerate(rows) for x, letter in enumerate(row) if letter != "."}
+
+# A full board near the end of a game, with the bag empty, from greedy self play
+BENCHMARK_ENDGAME_TILES = tiles_from_rows([
+	"..............f",
+	".c...........ti",
+	".u..........ped",
+	".l.........nee.",
+	".micra....kaon.",
+	".e...v...porny.",
+	".d...o.afire...",
+	"...bawties.soja",
+	".axile...s..woe",
+	".mug.d....nene.",
+	".........duos..",
+	"...........l...",
+	"........gyving.",
+	".....ziti..t...",
+	"......tabu.heth",
+])
+
+# Returns the best time in seconds out of repeat calls of fn
+def best_time(fn, repeat=3):
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		fn()
+		elapsed = time.perf_counter() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def print_table(header, rows):
+	widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+	for row in [header] + rows:
+		print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+# Returns a copy of dictionary that uses the given dawg
+def with_dawg(dictionary, dawg):
+	dictionary = copy.copy(dictionary)
+	dictionary.dawg = dawg
+	return dictionary
+
+def new_game(dictionary, tiles=BENCHMARK_TILES, rack=BENCHMARK_RACK, lexicons=None):
+	return Game(SCRABBLE_HEIGHT, SCRABBLE_WIDTH, tiles, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS,
+		list(rack), SCRABBLE_BINGO_BONUS, None, dictionary=dictionary, lexicons=lexicons)
+
+# Follows every path from the root through the traversal methods and counts the words found
+def walk_words(dawg):
+	words = 0
+	stack = [dawg.root]
+	while stack:
+		node = stack.pop()
+		if dawg.is_final(node):
+			words += 1
+		for letter, child in dawg.children(node):
+			stack.append(child)
+	return words
+
+def bench_dawg(dictionary_file):
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	dictionary = Dictionary(dictionary_file)
+	dawg_bytes = tracemalloc.get_traced_memory()[0] - before
+
+	before = tracemalloc.get_traced_memory()[0]
+	flat = FlatDawg.from_dawg(dictionary.dawg)
+	flat_bytes = tracemalloc.get_traced_memory()[0] - before
+	tracemalloc.stop()
+
+	words = open(dictionary_file, "rt").read().split()
+	flat_dictionary = with_dawg(dictionary, flat)
+
+	rows = []
+	for name, dawg, memory, game_dictionary in [("Dawg", dictionary.dawg, dawg_bytes, dictionary), ("FlatDawg", flat, flat_bytes, flat_dictionary)]:
+		walk = best_time(lambda: walk_words(dawg))
+		lookup = best_time(lambda: [dawg.lookup(word) for word in words])
+		generate = best_time(lambda: new_game(game_dictionary).Algorithm())
+		rows.append([name, dawg.nodeCount(), dawg.edgeCount(), "{:.1f}".format(memory / 2**20),
+			"{:.3f}".format(walk), "{:.0f}".format(len(words) / lookup), "{:.3f}".format(generate)])
+
+	print_table(["structure", "nodes", "edges", "memory MB", "walk all s", "lookups/s", "generate s"], rows)
+
+def bench_cross_checks(dictionary_file):
+	dictionary = Dictionary(dictionary_file)
+
+	rows = []
+	for name, tiles in [("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		# Creating a game evaluates the cross checks and scores of every empty square in both directions
+		seconds = best_time(lambda: [new_game(dictionary, tiles) for _ in range(10)]) / 10
+		rows.append([name, len(tiles), "{:.2f}".format(seconds * 1000)])
+
+	print_table(["board", "tiles", "ms per board"], rows)
+
+# Racks used by the generation benchmarks
+BENCHMARK_RACKS = [
+	("no blank", ["a", "e", "r", "s", "t", "u", "m"]),
+	("one blank", ["a", "e", "r", "s", "t", "u", BLANK]),
+]
+
+def bench_generation(dictionary_file):
+	dictionary = Dictionary(dictionary_file)
+
+	rows = []
+	for board, tiles in [("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in BENCHMARK_RACKS:
+			games = []
+			def generate():
+				game = new_game(dictionary, tiles, rack)
+				game.Algorithm()
+				games.append(game)
+			seconds = best_time(generate)
+			moves = len(games[-1].possible_moves)
+			rows.append([board, rack_name, moves, "{:.3f}".format(seconds), "{:.0f}".format(moves / seconds)])
+
+	print_table(["board", "rack", "moves", "seconds", "moves/s"], rows)
+
+# Key that identifies a move, for comparing the moves found by different generators
+def move_key(move):
+	return (move.direction, move.start_coords, tuple((ML.letter, ML.already_placed, ML.was_blank) for ML in move.letters), move.score)
+
+def bench_engines(dictionary_file):
+	gaddag_file = COMPILED_GADDAG if os.path.exists(COMPILED_GADDAG) else None
+	dictionary = Dictionary(dictionary_file, gaddag_file=gaddag_file)
+	start = time.perf_counter()
+	dictionary.get_gaddag()
+	print("GADDAG ready in {:.2f} s".format(time.perf_counter() - start))
+
+	rows = []
+	for board, tiles in [("empty", {}), ("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in BENCHMARK_RACKS:
+			row = [board, rack_name]
+			move_sets = []
+			for engine in (DAWG_ENGINE, GADDAG_ENGINE):
+				games = []
+				def generate():
+					game = new_game(dictionary, tiles, rack)
+					game.Algorithm(engine)
+					games.append(game)
+				row.append("{:.3f}".format(best_time(generate)))
+				move_sets.append(sorted(move_key(move) for move in games[-1].possible_moves))
+			if move_sets[0] != move_sets[1]:
+				raise Exception("The engines found different moves for the {} board with rack {}".format(board, rack_name))
+			row.insert(2, len(move_sets[0]))
+			rows.append(row)
+
+	print_table(["board", "rack", "moves", "dawg s", "gaddag s"], rows)
+
+def bench_pruning(dictionary_file):
+	dictionary = Dictionary(dictionary_file)
+
+	rows = []
+	for board, tiles in [("empty", {}), ("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in BENCHMARK_RACKS:
+			results = []
+			def exhaustive():
+				game = new_game(dictionary, tiles, rack)
+				game.Algorithm()
+				results.append((game.stats.nodes_visited, game.return_highest() or []))
+			def branch_and_bound():
+				game = new_game(dictionary, tiles, rack)
+				best = game.best_moves()
+				results.append((game.stats.nodes_visited, best))
+
+			exhaustive_seconds = best_time(exhaustive)
+			exhaustive_nodes, highest = results[-1]
+			pruned_seconds = best_time(branch_and_bound)
+			pruned_nodes, best = results[-1]
+			if sorted(map(move_key, highest)) != sorted(map(move_key, best)):
+				raise Exception("The branch and bound search found different moves for the {} board with rack {}".format(board, rack_name))
+
+			rows.append([board, rack_name, best[0].score if best else "-", exhaustive_nodes, pruned_nodes,
+				"{:.3f}".format(exhaustive_seconds), "{:.3f}".format(pruned_seconds)])
+
+	print_table(["board", "rack", "best", "nodes", "pruned nodes", "exhaustive s", "pruned s"], rows)
+
+def bench_parallel(dictionary_file):
+	dictionary = Dictionary(dictionary_file)
+	max_workers = max(os.cpu_count() or 1, 2)
+
+	rows = []
+	for board, tiles in [("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in BENCHMARK_RACKS + [("two blanks", ["a", "e", "r", "s", "t", BLANK, BLANK])]:
+			sequential = None
+			for workers in range(1, max_workers + 1):
+				games = []
+				def generate():
+					game = new_game(dictionary, tiles, rack)
+					game.Algorithm(workers=workers)
+					games.append(game)
+				seconds = best_time(generate)
+				moves = [move_key(move) for move in games[-1].possible_moves]
+				if sequential is None:
+					sequential = (moves, seconds)
+				elif moves != sequential[0]:
+					raise Exception("{} workers found different moves for the {} board with rack {}".format(workers, board, rack_name))
+				rows.append([board, rack_name, workers, len(moves), "{:.3f}".format(seconds), "{:.2f}".format(sequential[1] / seconds)])
+
+	print("{} cores".format(os.cpu_count()))
+	print_table(["board", "rack", "workers", "moves", "seconds", "speedup"], rows)
+
+def bench_blanks(dictionary_file):
+	dictionary = Dictionary(dictionary_file)
+	racks = [("one blank", ["a", "e", "r", "s", "t", "u", BLANK]), ("two blanks", ["a", "e", "r", "s", "t", BLANK, BLANK])]
+
+	rows = []
+	for board, tiles in [("empty", {}), ("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in racks:
+			results = []
+			for all_blank_assignments in (True, False):
+				games = []
+				def generate():
+					game = new_game(dictionary, tiles, rack)
+					game.all_blank_assignments = all_blank_assignments
+					game.Algorithm()
+					games.append(game)
+				seconds = best_time(generate)
+				results.append((games[-1].possible_moves, games[-1].stats.nodes_visited, seconds))
+
+			# The best score of each placement of letters, whichever tiles are blanks
+			best_scores = {}
+			for move in results[0][0]:
+				key = (move.direction, move.start_coords, move.serialize(), tuple(ML.already_placed for ML in move.letters))
+				best_scores[key] = max(best_scores.get(key, move.score), move.score)
+			found_scores = {(move.direction, move.start_coords, move.serialize(), tuple(ML.already_placed for ML in move.letters)): move.score for move in results[1][0]}
+			if len(found_scores) != len(results[1][0]) or found_scores != best_scores:
+				raise Exception("The highest scoring blank assignments differ for the {} board with rack {}".format(board, rack_name))
+
+			(all_moves, all_nodes, all_seconds), (moves, nodes, seconds) = results
+			rows.append([board, rack_name, len(all_moves), len(moves), all_nodes, nodes,
+				"{:.3f}".format(all_seconds), "{:.3f}".format(seconds), "{:.2f}".format(all_seconds / seconds)])
+
+	print_table(["board", "rack", "all moves", "moves", "all nodes", "nodes", "all s", "s", "speedup"], rows)
+
+def bench_scoring(dictionary_file):
+	import scrabble_solver_game
+	if scrabble_solver_game.numpy is None:
+		raise Exception("The scoring benchmark compares score_moves with NumPy to score_move, so NumPy has to be installed")
+
+	dictionary = Dictionary(dictionary_file)
+	racks = [("one blank", ["a", "e", "r", "s", "t", "u", BLANK]), ("two blanks", ["a", "e", "r", "s", "t", BLANK, BLANK])]
+
+	rows = []
+	for board, tiles in [("empty", {}), ("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES)]:
+		for rack_name, rack in racks:
+			# Every blank assignment, for positions with 10k moves or more
+			game = new_game(dictionary, tiles, rack)
+			game.all_blank_assignments = True
+			game.Algorithm()
+			moves = game.possible_moves
+			scores = [move.score for move in moves]
+
+			def score_each():
+				for move in moves:
+					move.score = 0
+					game.score_move(move)
+			seconds = best_time(score_each)
+			if [move.score for move in moves] != scores:
+				raise Exception("score_move scored the moves differently for the {} board with rack {}".format(board, rack_name))
+
+			batch_seconds = best_time(lambda: game.score_moves(moves))
+			if [move.score for move in moves] != scores:
+				raise Exception("score_moves scored the moves differently for the {} board with rack {}".format(board, rack_name))
+
+			rows.append([board, rack_name, len(moves), "{:.3f}".format(seconds), "{:.3f}".format(batch_seconds),
+				"{:.0f}".format(len(moves) / seconds), "{:.0f}".format(len(moves) / batch_seconds), "{:.2f}".format(seconds / batch_seconds)])
+
+	print_table(["board", "rack", "moves", "score_move s", "score_moves s", "moves/s", "batch moves/s", "speedup"], rows)
+
+# Number of positions solved by the cache benchmark, drawn with repeats from the suite corpus, as a
+# server giving hints would be asked for them
+CACHE_REQUESTS = 60
+
+def bench_cache(dictionary_file):
+	from position_cache import MoveCache
+	from scrabble_solver_game import Solver
+
+	rng = random.Random(0)
+	positions = [(tiles, rack) for board, tiles in SUITE_BOARDS for rack_name, rack in BENCHMARK_RACKS]
+	requests = [rng.choice(positions) for _ in range(CACHE_REQUESTS)]
+
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "moves.sqlite")
+		# The disk only cache keeps nothing in memory, so it reads every list back from the file that
+		# the one before it wrote
+		caches = [("none", None), ("memory", lambda: MoveCache()), ("memory, 4 lists", lambda: MoveCache(max_entries=4)),
+			("memory and disk", lambda: MoveCache(path=path)), ("disk only", lambda: MoveCache(max_moves=0, path=path))]
+
+		rows = []
+		expected = None
+		for name, new_cache in caches:
+			solver = Solver(SCRABBLE_HEIGHT, SCRABBLE_WIDTH, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS, SCRABBLE_BINGO_BONUS,
+				dictionary_file, cache=new_cache() if new_cache else None)
+			start = time.perf_counter()
+			results = [[(move.serialize(), move.score, move.direction, move.start_coords) for move in solver.solve(tiles, rack)] for tiles, rack in requests]
+			seconds = time.perf_counter() - start
+			if expected is None:
+				expected = results
+			elif results != expected:
+				raise Exception("The moves found with the {} cache differ".format(name))
+
+			cache = solver.cache
+			if cache is None:
+				rows.append([name, len(requests), "{:.2f}".format(seconds), "{:.1f}".format(len(requests) / seconds), "", "", "", ""])
+			else:
+				rows.append([name, len(requests), "{:.2f}".format(seconds), "{:.1f}".format(len(requests) / seconds),
+					cache.hits, cache.disk_hits, cache.misses, cache.evictions])
+
+	print_table(["cache", "positions", "s", "positions/s", "hits", "disk hits", "misses", "evictions"], rows)
+
+def bench_simulation(dictionary_file):
+	from simulation import simulate
+
+	dictionary = Dictionary(dictionary_file)
+	max_workers = max(os.cpu_count() or 1, 2)
+	candidates, rollouts = 4, 8
+
+	rows = []
+	for plies in (2, 4):
+		sequential = None
+		for workers in range(1, max_workers + 1):
+			start = time.perf_counter()
+			results = simulate(new_game(dictionary), candidates, rollouts, plies, workers)
+			seconds = time.perf_counter() - start
+			equities = [(result.move.serialize(), result.equity) for result in results]
+			if sequential is None:
+				sequential = (equities, seconds)
+			elif equities != sequential[0]:
+				raise Exception("{} workers gave different equities for {} plies".format(workers, plies))
+			total = sum(result.rollouts for result in results)
+			rows.append([plies, workers, total, "{:.2f}".format(seconds), "{:.1f}".format(total / seconds), "{:.2f}".format(sequential[1] / seconds)])
+
+	print("{} cores".format(os.cpu_count()))
+	print_table(["plies", "workers", "rollouts", "seconds", "rollouts/s", "speedup"], rows)
+
+# Boards and racks of the suite
+SUITE_BOARDS = [("empty", {}), ("sparse", BENCHMARK_TILES), ("dense", BENCHMARK_DENSE_TILES), ("endgame", BENCHMARK_ENDGAME_TILES)]
+SUITE_RACKS = BENCHMARK_RACKS + [("two blanks", ["a", "e", "r", "s", "t", BLANK, BLANK])]
+
+# Phases of solving a position timed by the suite
+SUITE_PHASES = ["cross_checks", "algorithm", "score_move", "sort_highest"]
+
+# Changes in time below this many seconds are not counted as regressions, being within the noise
+SUITE_NOISE_SECONDS = 0.001
+
+# Returns the short hash of the checked out commit, or None outside of a git checkout
+def git_commit():
+	try:
+		result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+	except (OSError, subprocess.CalledProcessError):
+		return None
+	return result.stdout.strip()
+
+# Times each phase of solving a position and returns its results
+def suite_position(dictionary, board, tiles, rack_name, rack):
+	game = new_game(dictionary, tiles, rack)
+
+	def algorithm():
+		game.possible_moves = []
+		game.Algorithm()
+	algorithm_seconds = best_time(algorithm)
+	moves = game.possible_moves
+	scores = [move.score for move in moves]
+
+	def score_moves():
+		for move in moves:
+			move.score = 0
+			game.score_move(move)
+	score_seconds = best_time(score_moves)
+	if [move.score for move in moves] != scores:
+		raise Exception("score_move gave different scores for the {} board with rack {}".format(board, rack_name))
+
+	# Sort the moves in the order they were found each time, since sorting sorted moves is faster
+	def sort_moves():
+		game.possible_moves = list(moves)
+		game.sort_highest()
+
+	# Peak memory allocated while generating the moves, traced separately since tracing slows it down
+	tracemalloc.start()
+	algorithm()
+	peak_bytes = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {
+		"board": board,
+		"rack": rack_name,
+		"tiles": len(tiles),
+		"moves": len(moves),
+		"seconds": {
+			"cross_checks": best_time(game.eval_cross_checks_and_scores),
+			"algorithm": algorithm_seconds,
+			"score_move": score_seconds,
+			"sort_highest": best_time(sort_moves),
+		},
+		"moves_per_second": len(moves) / algorithm_seconds,
+		"peak_kb": peak_bytes / 1024,
+	}
+
+# Prints how the results compare with saved results, and returns the number of regressions
+def compare_results(results, baseline, tolerance):
+	regressions = 0
+	rows = []
+
+	def compare(name, phase, seconds, baseline_seconds):
+		nonlocal regressions
+		change = (seconds - baseline_seconds) / baseline_seconds if baseline_seconds else 0.0
+		slower = change > tolerance and seconds - baseline_seconds > SUITE_NOISE_SECONDS
+		regressions += slower
+		rows.append([name, phase, "{:.4f}".format(baseline_seconds), "{:.4f}".format(seconds), "{:+.1%}".format(change), "SLOWER" if slower else ""])
+
+	if results["lexicon"]["file"] == baseline["lexicon"]["file"]:
+		compare("lexicon", "build", results["lexicon"]["seconds"], baseline["lexicon"]["seconds"])
+
+	baseline_positions = {(position["board"], position["rack"]): position for position in baseline["positions"]}
+	for position in results["positions"]:
+		name = "{} / {}".format(position["board"], position["rack"])
+		old = baseline_positions.get((position["board"], position["rack"]))
+		if old is None:
+			continue
+		if position["moves"] != old["moves"]:
+			regressions += 1
+			rows.append([name, "moves", old["moves"], position["moves"], "", "CHANGED"])
+		for phase in SUITE_PHASES:
+			compare(name, phase, position["seconds"][phase], old["seconds"][phase])
+
+	print("Compared with {} ({})".format(baseline.get("commit") or "unknown commit", baseline.get("date", "unknown date")))
+	print_table(["position", "phase", "baseline", "now", "change", ""], rows)
+	return regressions
+
+def bench_suite(dictionary_file, output=None, baseline_file=None, tolerance=0.1):
+	# Building a dictionary from a word list prints its build stats
+	with contextlib.redirect_stdout(None):
+		start = time.perf_counter()
+		dictionary = Dictionary(dictionary_file)
+		lexicon_seconds = time.perf_counter() - start
+	build_stats = getattr(dictionary, "build_stats", None)
+
+	results = {
+		"commit": git_commit(),
+		"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"python": platform.python_version(),
+		"machine": platform.platform(),
+		"lexicon": {
+			"file": os.path.basename(dictionary_file),
+			# Building from a word list, or only mapping a compiled dawg
+			"built": build_stats is not None,
+			"seconds": lexicon_seconds,
+			"words_per_second": build_stats.words_per_second() if build_stats else None,
+		},
+		"positions": [],
+	}
+
+	rows = [["lexicon", "", results["lexicon"]["file"], "", "{:.3f}".format(lexicon_seconds), "", "", "", "", ""]]
+	for board, tiles in SUITE_BOARDS:
+		for rack_name, rack in SUITE_RACKS:
+			position = suite_position(dictionary, board, tiles, rack_name, rack)
+			results["positions"].append(position)
+			seconds = position["seconds"]
+			rows.append([board, rack_name, position["moves"], "{:.2f}".format(seconds["cross_checks"] * 1000),
+				"{:.3f}".format(seconds["algorithm"]), "{:.2f}".format(seconds["score_move"] * 1000), "{:.2f}".format(seconds["sort_highest"] * 1000),
+				"{:.0f}".format(position["moves_per_second"]), "{:.0f}".format(position["peak_kb"]), ""])
+
+	# Peak resident set size of the whole run, including the lexicon
+	peak = peak_memory()
+	results["peak_rss_mb"] = peak / 2**20 if peak is not None else None
+
+	print_table(["board", "rack", "moves", "cross checks ms", "algorithm s", "score_move ms", "sort ms", "moves/s", "peak KB", ""], rows)
+	if peak is not None:
+		print("Peak resident memory {:.1f} MB".format(results["peak_rss_mb"]))
+
+	if output:
+		with open(output, "wt") as f:
+			json.dump(results, f, indent=1)
+		print("Saved the results to {}".format(output))
+
+	if baseline_file:
+		with open(baseline_file, "rt") as f:
+			baseline = json.load(f)
+		regressions = compare_results(results, baseline, tolerance)
+		if regressions:
+			print("{} regressions".format(regressions))
+			sys.exit(1)
+
+# Entries of the synthetic word list of the ingest benchmark, drawn with repeats from fewer distinct words
+INGEST_ENTRIES = 2000000
+INGEST_DISTINCT_WORDS = 1500000
+
+# Writes a gzipped word list of random words, some in upper case, with duplicates
+def write_synthetic_word_list(path, entries=INGEST_ENTRIES, distinct_words=INGEST_DISTINCT_WORDS, seed=0):
+	rng = random.Random(seed)
+	words = ["".join(rng.choices(ascii_lowercase, k=rng.randint(2, 15))) for _ in range(distinct_words)]
+	with gzip.open(path, "wt") as f:
+		for _ in range(entries):
+			word = words[rng.randrange(distinct_words)]
+			f.write((word.upper() if rng.random() < 0.1 else word) + "\n")
+
+# Reads a word list into sorted distinct words, with chunk_words at a time merge sorted by WordListReader,
+# or all in memory if chunk_words is None, the way Dictionary read a word list before. Run in a new
+# process, so that its peak memory is that of reading the list alone. Returns the number of words, a
+# digest of them, the time taken and the peak memory.
+def ingest_word_list(path, chunk_words):
+	start = time.perf_counter()
+	if chunk_words is None:
+		with open_word_list(path) as f:
+			words = sorted(set(word for word in map(normalize_word, f.read().split()) if word))
+	else:
+		words = WordListReader(path, chunk_words=chunk_words)
+
+	digest = hashlib.sha1()
+	count = 0
+	for word in words:
+		digest.update(word.encode() + b"\n")
+		count += 1
+	return count, digest.hexdigest(), time.perf_counter() - start, peak_memory()
+
+def bench_ingest(dictionary_file):
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "synthetic.txt.gz")
+		# The list is written by a new process too, since a process started while this one held the
+		# words would count them in its peak memory
+		with multiprocessing.get_context("spawn").Pool(1) as pool:
+			pool.apply(write_synthetic_word_list, (path,))
+		print("{} entries, {:.1f} MB gzipped".format(INGEST_ENTRIES, os.path.getsize(path) / 2**20))
+
+		rows = []
+		expected = None
+		for name, chunk_words in [("in memory", None), ("chunks of 500000", 500000), ("chunks of 100000", 100000)]:
+			with multiprocessing.get_context("spawn").Pool(1) as pool:
+				count, digest, seconds, peak = pool.apply(ingest_word_list, (path, chunk_words))
+			if expected is None:
+				expected = digest
+			elif digest != expected:
+				raise Exception("Reading {} gave different words".format(name))
+			rows.append([name, count, "{:.2f}".format(seconds), "{:.1f}".format(peak / 2**20) if peak is not None else "unknown"])
+
+	print_table(["read", "words", "seconds", "peak MB"], rows)
+
+# Lexicons of the lexicons benchmark and the fraction of the dictionary's words, chosen at random, that
+# each leaves out
+BENCHMARK_LEXICONS = [("full", 0.0), ("national", 0.05), ("club", 0.08)]
+
+def bench_lexicons(dictionary_file):
+	with contextlib.redirect_stdout(None):
+		words = dawg_words(Dictionary(dictionary_file).dawg)
+
+	rows = []
+	with tempfile.TemporaryDirectory() as directory:
+		rng = random.Random(0)
+		paths = {}
+		for name, left_out in BENCHMARK_LEXICONS:
+			paths[name] = os.path.join(directory, name + ".txt")
+			with open(paths[name], "wt") as f:
+				f.writelines(word + "\n" for word in words if rng.random() >= left_out)
+
+		# The dawgs are flattened to count the bytes of their arrays
+		separate = {}
+		total_nodes, total_edges, total_bytes, total_seconds = 0, 0, 0, 0.0
+		for name, path in paths.items():
+			with contextlib.redirect_stdout(None):
+				start = time.perf_counter()
+				separate[name] = Dictionary(path, flat=True)
+				seconds = time.perf_counter() - start
+			dawg = separate[name].dawg
+			rows.append([name, dawg.word_count, dawg.nodeCount(), dawg.edgeCount(), "{:.0f}".format(dawg.nbytes() / 1024), "{:.2f}".format(seconds)])
+			total_nodes += dawg.nodeCount()
+			total_edges += dawg.edgeCount()
+			total_bytes += dawg.nbytes()
+			total_seconds += seconds
+		rows.append(["separate total", "", total_nodes, total_edges, "{:.0f}".format(total_bytes / 1024), "{:.2f}".format(total_seconds)])
+
+		with contextlib.redirect_stdout(None):
+			start = time.perf_counter()
+			combined = Dictionary(paths, flat=True)
+			seconds = time.perf_counter() - start
+		dawg = combined.dawg
+		rows.append(["combined", dawg.word_count, dawg.nodeCount(), dawg.edgeCount(), "{:.0f}".format(dawg.nbytes() / 1024), "{:.2f}".format(seconds)])
+
+	for name in paths:
+		mask = combined.lexicon_mask(name)
+		if any(combined.check_word(word, mask) != separate[name].check_word(word) for word in words):
+			raise Exception("The combined dawg holds different words for {}".format(name))
+		for tiles in (BENCHMARK_TILES, BENCHMARK_DENSE_TILES):
+			game = new_game(separate[name], tiles, BENCHMARK_RACK)
+			game.Algorithm()
+			combined_game = new_game(combined, tiles, BENCHMARK_RACK, lexicons=name)
+			combined_game.Algorithm()
+			if list(map(move_key, game.possible_moves)) != list(map(move_key, combined_game.possible_moves)):
+				raise Exception("The combined dawg found different moves for {}".format(name))
+
+	print_table(["lexicon", "words", "nodes", "edges", "KB", "build s"], rows)
+
+BENCHMARKS = {
+	"suite": bench_suite,
+	"dawg": bench_dawg,
+	"cross_checks": bench_cross_checks,
+	"generation": bench_generation,
+	"engines": bench_engines,
+	"pruning": bench_pruning,
+	"parallel": bench_parallel,
+	"blanks": bench_blanks,
+	"scoring": bench_scoring,
+	"cache": bench_cache,
+	"ingest": bench_ingest,
+	"lexicons": bench_lexicons,
+	"simulation": bench_simulation,
+}
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark the solver")
+	parser.add_argument("benchmark", choices=list(BENCHMARKS))
+	parser.add_argument("dictionary", nargs="?", default=DICTIONARY, help="word list or compiled dawg (default: {})".format(DICTIONARY))
+	parser.add_argument("--output", help="suite: save the results as JSON")
+	parser.add_argument("--compare", help="suite: compare with results saved with --output")
+	parser.add_argument("--tolerance", type=float, default=0.1, help="suite: fraction by which a phase can get slower before it is a regression")
+	args = parser.parse_args()
+
+	if args.benchmark == "suite":
+		bench_suite(args.dictionary, args.output, args.compare, args.tolerance)
+	else:
+		BENCHMARKS[args.benchmark](args.dictionary)
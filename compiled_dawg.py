@@ -0,0 +1,101 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Compiles a Dawg into a flat binary file that can be memory mapped instead of rebuilt from the
+# word list every time a Dictionary is created. Because the file is mapped read only, several
+# processes on the same machine that open the same compiled lexicon share its pages.
+#
+# The file holds the arrays of a FlatDawg (all integers are unsigned and in the byte order of
+# the machine that compiled it):
+#
+#	header				MAGIC, then u32 version, byte order mark, node count, edge count,
+#						word count, root node index and lexicon count
+#	first_edge			u32 * (node count + 1)
+#	counts				u32 * node count
+#	child_masks			u32 * node count
+#	edge_targets		u32 * edge count
+#	edge_offsets		u32 * edge count
+#	final				u8 * node count
+#	edge_labels			u8 * edge count
+#	lexicon names		the name of the lexicon of each bit of final, in bit order, in UTF-8 with a
+#						newline after each
+#
+# Usage: python compiled_dawg.py dict.txt dict.dawg
+#
+# or, for a dawg serving several lexicons, python compiled_dawg.py name=list... dict.dawg, where the
+# same name can be given several lists.
+
+import mmap
+import struct
+import sys
+
+from flat_dawg import FlatDawg
+from helper_lists import DEFAULT_LEXICON
+
+MAGIC = b"SCRBDAWG"
+VERSION = 4
+BYTE_ORDER_MARK = 0x01020304
+
+HEADER = struct.Struct("=8s7I")
+
+# Writes the given finished Dawg or FlatDawg to path in the compiled format, with the names of the
+# lexicons of the bits of its final nodes
+def compile_dawg(dawg, path, lexicon_names=(DEFAULT_LEXICON,)):
+	if not isinstance(dawg, FlatDawg):
+		dawg = FlatDawg.from_dawg(dawg)
+
+	with open(path, "wb") as f:
+		f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, dawg.node_count, dawg.edge_count, dawg.word_count, dawg.root, len(lexicon_names)))
+		for section in dawg.sections():
+			section.tofile(f)
+		f.write("".join(name + "\n" for name in lexicon_names).encode("utf-8"))
+
+# Checks whether a file starts with the compiled dawg header
+def is_compiled_dawg(path):
+	with open(path, "rb") as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+# A read only FlatDawg whose arrays are views into a memory mapped compiled file
+class CompiledDawg(FlatDawg):
+	def __init__(self, path):
+		with open(path, "rb") as f:
+			self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		magic, version, byte_order_mark, node_count, edge_count, word_count, root, lexicon_count = HEADER.unpack_from(self.mmap, 0)
+		if magic != MAGIC:
+			raise ValueError("{} is not a compiled dawg".format(path))
+		if version != VERSION:
+			raise ValueError("{} has version {}, expected {}".format(path, version, VERSION))
+		if byte_order_mark != BYTE_ORDER_MARK:
+			raise ValueError("{} was compiled on a machine with a different byte order".format(path))
+
+		view = memoryview(self.mmap)
+		offset = HEADER.size
+		first_edge, offset = self._section(view, offset, node_count + 1, "I")
+		counts, offset = self._section(view, offset, node_count, "I")
+		child_masks, offset = self._section(view, offset, node_count, "I")
+		edge_targets, offset = self._section(view, offset, edge_count, "I")
+		edge_offsets, offset = self._section(view, offset, edge_count, "I")
+		final, offset = self._section(view, offset, node_count, "B")
+		edge_labels, offset = self._section(view, offset, edge_count, "B")
+		self.lexicon_names = self.mmap[offset:].decode("utf-8").split("\n")[:lexicon_count]
+
+		super().__init__(first_edge, counts, final, child_masks, edge_labels, edge_targets, edge_offsets, root)
+
+	@staticmethod
+	def _section(view, offset, length, typecode):
+		size = length * struct.calcsize(typecode)
+		return view[offset:offset + size].cast(typecode), offset + size
+
+if __name__ == "__main__":
+	from solver_helper_classes import Dictionary
+	from word_lists import parse_word_list_args
+
+	if len(sys.argv) < 3:
+		print("Usage: python compiled_dawg.py <word list>... <compiled dawg>")
+		print("       python compiled_dawg.py <lexicon name>=<word list>... <compiled dawg>")
+		sys.exit(1)
+
+	dictionary = Dictionary(parse_word_list_args(sys.argv[1:-1]))
+	compile_dawg(dictionary.dawg, sys.argv[-1], dictionary.lexicon_names)
+	print("Compiled {} words into {}".format(dictionary.dawg.root.count, sys.argv[-1]))
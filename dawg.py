@@ -11,6 +11,11 @@
 import sys
 import time
 
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
 # This class represents a node in the directed acyclic word graph (DAWG). It
 # has a list of edges to other nodes. It has functions for testing whether it
 # is equivalent to another node. Nodes are equivalent if they have identical
@@ -22,18 +27,26 @@ class DawgNode:
     def __init__(self):
         self.id = DawgNode.NextId
         DawgNode.NextId += 1
+        # False, or for a node where a word ends, True or the bitset of the
+        # lexicons that hold the word (see build_masked_dawg)
         self.final = False
         self.edges = {}
 
         # Number of end nodes reachable from this one.
         self.count = 0
 
+        # Map from each edge label to the number of words that come before
+        # the words through that edge, among the words starting at this node.
+        # Assigned by Dawg.finish.
+        self.offsets = None
+
+        # Mask of the lowercase letters on the edges leaving this node, with
+        # bit 0 for "a". Assigned by Dawg.finish.
+        self.mask = 0
+
     def __str__(self):        
         arr = []
-        if self.final: 
-            arr.append("1")
-        else:
-            arr.append("0")
+        arr.append( str( int( self.final ) ) )
 
         for (label, node) in self.edges.items():
             arr.append( label )
@@ -47,6 +60,13 @@ class DawgNode:
     def __eq__(self, other):
         return self.__str__() == other.__str__()
 
+    # A tuple that is equal for equivalent nodes. Only valid once every child
+    # has been minimized, which is when Dawg._minimize asks for it, so it is
+    # built once per node instead of formatting __str__ on every comparison.
+    def signature(self):
+        return (self.final,) + tuple(
+            (label, node.id) for (label, node) in self.edges.items() )
+
     def numReachable(self):
         # if a count is already assigned, return it
         if self.count: return self.count
@@ -61,6 +81,17 @@ class DawgNode:
         self.count = count
         return count
 
+    def assignOffsets(self):
+        # the word ending here, if any, sorts before every longer word
+        skipped = 1 if self.final else 0
+        self.offsets = {}
+        self.mask = 0
+        for label, node in sorted(self.edges.items()):
+            self.offsets[label] = skipped
+            skipped += node.count
+            if "a" <= label <= "z":
+                self.mask |= 1 << (ord(label) - ord("a"))
+
 class Dawg:
     def __init__(self):
         self.previousWord = ""
@@ -69,14 +100,17 @@ class Dawg:
         # Here is a list of nodes that have not been checked for duplication.
         self.uncheckedNodes = []
 
-        # Here is a list of unique nodes that have been checked for
-        # duplication.
+        # Here is a map from the signature of each unique node that has been
+        # checked for duplication to the node.
         self.minimizedNodes = {}
 
         # Here is the data associated with all the nodes
         self.data = []
 
-    def insert( self, word, data ):
+    # Inserts a word, marking its final node with final, which is True or
+    # the bitset of the lexicons that hold the word. Nodes are only merged
+    # when they have the same final value.
+    def insert( self, word, data, final=True ):
         if word <= self.previousWord:
             raise Exception("Error: Words must be inserted in alphabetical " +
                 "order.")
@@ -107,7 +141,7 @@ class Dawg:
             self.uncheckedNodes.append( (node, letter, nextNode) )
             node = nextNode
 
-        node.final = True
+        node.final = final
         self.previousWord = word
 
     def finish( self ):
@@ -117,39 +151,69 @@ class Dawg:
         # go through entire structure and assign the counts to each node.
         self.root.numReachable()
 
+        # then precompute the word offsets of every edge, so that lookup
+        # does not have to sort the edges of each node it passes through, and
+        # the letter mask of every node
+        self.root.assignOffsets()
+        for node in self.minimizedNodes.values():
+            node.assignOffsets()
+
     def _minimize( self, downTo ):
         # proceed from the leaf up to a certain point
         for i in range( len(self.uncheckedNodes) - 1, downTo - 1, -1 ):
             (parent, letter, child) = self.uncheckedNodes[i];
-            if child in self.minimizedNodes:
+            signature = child.signature()
+            if signature in self.minimizedNodes:
                 # replace the child with the previously encountered one
-                parent.edges[letter] = self.minimizedNodes[child]
+                parent.edges[letter] = self.minimizedNodes[signature]
             else:
                 # add the state to the minimized nodes.
-                self.minimizedNodes[child] = child;
+                self.minimizedNodes[signature] = child;
             self.uncheckedNodes.pop()
 
     def lookup( self, word ):
         node = self.root
         skipped = 0 # keep track of number of final nodes that we skipped
         for letter in word:
-            if letter not in node.edges: return None
-            for label, child in sorted(node.edges.items()):
-                if label == letter: 
-                    if node.final: skipped += 1
-                    node = child
-                    break
-                skipped += child.count
+            child = node.edges.get(letter)
+            if child is None: return None
+            skipped += node.offsets[letter]
+            node = child
 
         if node.final:
             return self.data[skipped]
 
+    # Like lookup, but only says whether word is in the dawg, or in any of the
+    # lexicons in the bitset lexicons
+    def contains( self, word, lexicons=-1 ):
+        node = self.root
+        for letter in word:
+            node = node.edges.get(letter)
+            if node is None: return False
+        return bool( node.final & lexicons )
+
+    # Traversal methods shared with CompiledDawg, so that callers can walk
+    # either representation without touching the nodes directly.
+    def children( self, node ):
+        return node.edges.items()
+
+    def child( self, node, letter ):
+        return node.edges.get(letter)
+
+    # Whether a word ends at node, in any of the lexicons in the bitset
+    # lexicons. The result is only meant to be tested for truth.
+    def is_final( self, node, lexicons=-1 ):
+        return node.final & lexicons
+
+    def child_mask( self, node ):
+        return node.mask
+
     def nodeCount( self ):
         return len(self.minimizedNodes)
 
     def edgeCount( self ):
         count = 0
-        for node in self.minimizedNodes:
+        for node in self.minimizedNodes.values():
             count += len(node.edges)
         return count
 
@@ -164,3 +228,56 @@ class Dawg:
             for label, child in node.edges.items():
                 print("    {} goto {}".format(label, child.id))
                 stack.append(child)
+
+# Statistics about building a Dawg with build_dawg
+class BuildStats:
+    def __init__(self, words, nodes, edges, seconds, peak_memory):
+        self.words = words
+        self.nodes = nodes
+        self.edges = edges
+        self.seconds = seconds
+
+        # Peak resident set size of the process in bytes, or None if unknown
+        self.peak_memory = peak_memory
+
+    def words_per_second(self):
+        return self.words / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        if self.peak_memory is None:
+            memory = "unknown"
+        else:
+            memory = "{:.1f} MB".format(self.peak_memory / 2**20)
+        return ("Built dawg of {} words in {:.2f} s ({:.0f} words/s), {} nodes, "
+            "{} edges, peak memory {}".format(self.words, self.seconds,
+            self.words_per_second(), self.nodes, self.edges, memory))
+
+def peak_memory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Builds a Dawg from an iterable of words in sorted order. The words are
+# consumed one at a time, so they can be streamed from a file. data is a
+# function giving the data to associate with each word. Returns the finished
+# Dawg and its BuildStats.
+def build_dawg( words, data=lambda word: None ):
+    return build_masked_dawg( ( ( word, True ) for word in words ), data )
+
+# Like build_dawg, but from (word, lexicons) pairs in sorted order, where
+# lexicons is the bitset of the lexicons that hold the word, so that one dawg
+# can serve several overlapping word lists. Its final nodes hold the bitsets.
+def build_masked_dawg( entries, data=lambda word: None ):
+    start = time.time()
+    dawg = Dawg()
+    count = 0
+    for word, lexicons in entries:
+        dawg.insert( word, data( word ), lexicons )
+        count += 1
+    dawg.finish()
+
+    stats = BuildStats( count, dawg.nodeCount(), dawg.edgeCount(),
+        time.time() - start, peak_memory() )
+    return dawg, stats
@@ -0,0 +1,158 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# A compact representation of a finished Dawg. Instead of one DawgNode object with an edges dict
+# per node, nodes are integer indices into a few contiguous arrays:
+#
+#	first_edge			edges of node n are first_edge[n]:first_edge[n+1]
+#	counts				number of words reachable from each node, used to index words
+#	final				0, or for a node where a word ends, the bitset of the lexicons that hold the
+#						word (1 for a dawg of one word list)
+#	child_masks			mask of the letters that leave each node, bit 0 is "a", and bit 26 is
+#						the GADDAG separator
+#	edge_labels			letter of each edge, the edges of a node are sorted by letter
+#	edge_targets		node reached by following each edge
+#	edge_offsets		number of words starting at the edge's node that sort before the words
+#						through the edge, so that a word's index is the sum along its path
+#
+# Because the edges of a node are sorted and every label has a bit in the child mask, in the same
+# order as the labels sort, the edge for a label is found with a popcount of the child mask below
+# that label's bit instead of a search. The popcount is bin(x).count("1") rather than int.bit_count,
+# which needs Python 3.10.
+
+from array import array
+
+from helper_lists import LETTER_BITS, GADDAG_SEPARATOR
+
+# The final byte of a node holds its lexicon bitset, so a dawg can serve up to 8 lexicons
+MAX_LEXICONS = 8
+
+# Characters for each edge label, so that traversal does not call chr() on every edge
+LABEL_CHARS = [chr(i) for i in range(256)]
+
+# Bit of each edge label in a child mask. Edges are found by counting the bits below a label's bit,
+# so the separator, which sorts after the letters, takes the bit after "z".
+LABEL_BITS = dict(LETTER_BITS)
+LABEL_BITS[GADDAG_SEPARATOR] = 1 << len(LETTER_BITS)
+
+class FlatDawg:
+	def __init__(self, first_edge, counts, final, child_masks, edge_labels, edge_targets, edge_offsets, root=0):
+		self.first_edge = first_edge
+		self.counts = counts
+		self.final = final
+		self.child_masks = child_masks
+		self.edge_labels = edge_labels
+		self.edge_targets = edge_targets
+		self.edge_offsets = edge_offsets
+		self.root = root
+
+		self.node_count = len(counts)
+		self.edge_count = len(edge_targets)
+		self.word_count = counts[root]
+
+	@classmethod
+	def from_dawg(cls, dawg):
+		# Number the nodes in depth first order starting from the root
+		node_ids = {dawg.root.id: 0}
+		nodes = [dawg.root]
+		stack = [dawg.root]
+		while stack:
+			node = stack.pop()
+			for label, child in sorted(node.edges.items()):
+				if child.id not in node_ids:
+					node_ids[child.id] = len(nodes)
+					nodes.append(child)
+					stack.append(child)
+
+		first_edge = array("I")
+		counts = array("I")
+		final = array("B")
+		child_masks = array("I")
+		edge_labels = array("B")
+		edge_targets = array("I")
+		edge_offsets = array("I")
+		for node in nodes:
+			first_edge.append(len(edge_targets))
+			counts.append(node.count)
+			if int(node.final) >= 1 << MAX_LEXICONS:
+				raise ValueError("Cannot flatten a dawg with more than {} lexicons".format(MAX_LEXICONS))
+			final.append(int(node.final))
+			mask = 0
+			# the word ending at the node, if any, sorts before every word through its edges
+			skipped = 1 if node.final else 0
+			for label, child in sorted(node.edges.items()):
+				if label not in LABEL_BITS:
+					raise ValueError("Cannot flatten a dawg with the edge label {!r}".format(label))
+				mask |= LABEL_BITS[label]
+				edge_labels.append(ord(label))
+				edge_targets.append(node_ids[child.id])
+				edge_offsets.append(skipped)
+				skipped += child.count
+			child_masks.append(mask)
+		first_edge.append(len(edge_targets))
+
+		return cls(first_edge, counts, final, child_masks, edge_labels, edge_targets, edge_offsets)
+
+	def children(self, node):
+		labels, targets = self.edge_labels, self.edge_targets
+		for edge in range(self.first_edge[node], self.first_edge[node + 1]):
+			yield LABEL_CHARS[labels[edge]], targets[edge]
+
+	def child(self, node, letter):
+		bit = LABEL_BITS.get(letter, 0)
+		mask = self.child_masks[node]
+		if not mask & bit:
+			return None
+		# The edge is preceded by one edge for every letter before it in the mask
+		return self.edge_targets[self.first_edge[node] + bin(mask & (bit - 1)).count("1")]
+
+	# Whether a word ends at the node, in any of the lexicons in the bitset lexicons. The result is only
+	# meant to be tested for truth.
+	def is_final(self, node, lexicons=-1):
+		return self.final[node] & lexicons
+
+	def child_mask(self, node):
+		return self.child_masks[node]
+
+	# Returns the index of the word in the sorted word list, or None if it is not a word
+	def lookup(self, word):
+		first_edge, child_masks, targets, offsets = self.first_edge, self.child_masks, self.edge_targets, self.edge_offsets
+		node = self.root
+		skipped = 0 # keep track of number of final nodes that we skipped
+		for letter in word:
+			bit = LABEL_BITS.get(letter, 0)
+			mask = child_masks[node]
+			if not mask & bit:
+				return None
+			edge = first_edge[node] + bin(mask & (bit - 1)).count("1")
+			skipped += offsets[edge]
+			node = targets[edge]
+
+		if self.final[node]:
+			return skipped
+
+	# Like lookup, but only says whether word is in the dawg, or in any of the lexicons in the bitset
+	# lexicons
+	def contains(self, word, lexicons=-1):
+		first_edge, child_masks, targets = self.first_edge, self.child_masks, self.edge_targets
+		node = self.root
+		for letter in word:
+			bit = LABEL_BITS.get(letter, 0)
+			mask = child_masks[node]
+			if not mask & bit:
+				return False
+			node = targets[first_edge[node] + bin(mask & (bit - 1)).count("1")]
+		return self.final[node] & lexicons != 0
+
+	def nodeCount(self):
+		return self.node_count
+
+	def edgeCount(self):
+		return self.edge_count
+
+	# Bytes used by the arrays that hold the graph
+	def nbytes(self):
+		return sum(len(section) * section.itemsize for section in self.sections())
+
+	def sections(self):
+		return (self.first_edge, self.counts, self.child_masks, self.edge_targets, self.edge_offsets, self.final, self.edge_labels)
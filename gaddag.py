@@ -0,0 +1,77 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Based on S.A. Gordon, A faster Scrabble move generation algorithm, Software: Practice and
+# Experience, 24 (2) (1994), pp. 219-232
+#
+# A GADDAG holds, for every way of splitting a word into a nonempty prefix and a suffix, the
+# reversed prefix followed by SEPARATOR and then the suffix. "cat" is stored as "c~at", "ac~t"
+# and "tac" (the separator is left off when the suffix is empty). Starting from any letter of a
+# word, the word can then be read outwards from that letter: leftwards first, then, after the
+# separator, rightwards. The strings are stored in a Dawg, so the same traversal methods work on
+# it, and it can be compiled like one. In a GADDAG that serves several lexicons, every string of a word
+# ends on a node holding the word's lexicon bitset, as in the dawg.
+#
+# Usage: python gaddag.py dict.txt dict.gaddag
+#
+# or python gaddag.py name=list... dict.gaddag for several lexicons, like compiled_dawg.py.
+
+import sys
+
+from dawg import build_masked_dawg
+from helper_lists import GADDAG_SEPARATOR as SEPARATOR
+
+# Returns the strings stored in the GADDAG for a word
+def gaddag_strings(word):
+	strings = []
+	for i in range(1, len(word)):
+		strings.append(word[i - 1::-1] + SEPARATOR + word[i:])
+	strings.append(word[::-1])
+	return strings
+
+# Builds a GADDAG from an iterable of words, in any order. Returns the Dawg and its BuildStats.
+def build_gaddag(words):
+	return build_masked_gaddag((word, True) for word in words)
+
+# Builds a GADDAG from an iterable of (word, lexicons) pairs, in any order, where lexicons is the
+# bitset of the lexicons that hold the word (see build_masked_dawg). Returns the Dawg and its BuildStats.
+def build_masked_gaddag(entries):
+	strings = []
+	for word, lexicons in entries:
+		strings.extend((string, lexicons) for string in gaddag_strings(word))
+	# Each string belongs to one word, so the pairs sort by their strings
+	strings.sort()
+	return build_masked_dawg(strings)
+
+# Returns every word in a dawg (or any lexicon with the dawg traversal methods), in sorted order, with
+# the final value of its node: the bitset of the lexicons that hold it, or 1 for a single word list
+def dawg_entries(dawg):
+	entries = []
+	stack = [(dawg.root, "")]
+	while stack:
+		node, prefix = stack.pop()
+		lexicons = dawg.is_final(node)
+		if lexicons:
+			entries.append((prefix, int(lexicons)))
+		# Push the children in reverse so that they are popped in alphabetical order
+		for letter, child in sorted(dawg.children(node), reverse=True):
+			stack.append((child, prefix + letter))
+	return entries
+
+# Returns every word in a dawg in sorted order
+def dawg_words(dawg):
+	return [word for word, lexicons in dawg_entries(dawg)]
+
+if __name__ == "__main__":
+	from compiled_dawg import compile_dawg
+	from solver_helper_classes import Dictionary
+	from word_lists import parse_word_list_args
+
+	if len(sys.argv) < 3:
+		print("Usage: python gaddag.py <word list>... <compiled gaddag>")
+		print("       python gaddag.py <lexicon name>=<word list>... <compiled gaddag>")
+		sys.exit(1)
+
+	dictionary = Dictionary(parse_word_list_args(sys.argv[1:-1]))
+	compile_dawg(dictionary.get_gaddag(), sys.argv[-1], dictionary.lexicon_names)
+	print("Compiled the GADDAG into {}".format(sys.argv[-1]))
@@ -5,6 +5,8 @@
 #
 # Uses dawg implementation by Steve Hanov at http://stevehanov.ca/blog/?id=115
 
+from string import ascii_lowercase
+
 SCRABBLE_HEIGHT = 15
 SCRABBLE_WIDTH = 15
 
@@ -15,8 +17,29 @@ TRIPLE_WORD = "tw"
 
 BLANK = "*"
 
+# Sets of letters (cross checks, rack contents, the edges leaving a dawg node) are kept as
+# 26 bit masks, with bit 0 for "a"
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(ascii_lowercase)}
+ALL_LETTERS_MASK = (1 << len(ascii_lowercase)) - 1
+
+# Marks the switch from the reversed prefix to the suffix of a word in a GADDAG. It sorts after
+# the letters, which the compiled format relies on.
+GADDAG_SEPARATOR = "~"
+
 DICTIONARY = "dict.txt"
 
+# The name of the one lexicon of a dawg built from word lists without naming lexicons
+DEFAULT_LEXICON = "default"
+
+# Created from DICTIONARY with: python compiled_dawg.py dict.txt dict.dawg
+COMPILED_DICTIONARY = "dict.dawg"
+
+# Created from DICTIONARY with: python gaddag.py dict.txt dict.gaddag
+COMPILED_GADDAG = "dict.gaddag"
+
+# Created with: python leaves.py leaves.bin
+COMPILED_LEAVES = "leaves.bin"
+
 SCRABBLE_BINGO_BONUS = 50
 
 current_rack = ["c", "a", "t", "c", "e", "r"]
@@ -106,4 +129,17 @@ SCRABBLE_LETTER_POINTS = {
     "q": 10, "r": 1 , "s": 1 , "t": 1 ,
     "u": 1 , "v": 4 , "w": 4 , "x": 8 ,
     "y": 4 , "z": 10, "*": 0
-}
\ No newline at end of file
+}
+
+# Number of each tile in a standard English set, 100 in all
+SCRABBLE_TILE_DISTRIBUTION = {
+	"a": 9 , "b": 2 , "c": 2 , "d": 4 ,
+	"e": 12, "f": 2 , "g": 3 , "h": 2 ,
+	"i": 9 , "j": 1 , "k": 1 , "l": 4 ,
+	"m": 2 , "n": 6 , "o": 8 , "p": 2 ,
+	"q": 1 , "r": 6 , "s": 4 , "t": 6 ,
+	"u": 4 , "v": 2 , "w": 2 , "x": 1 ,
+	"y": 2 , "z": 1 , "*": 2
+}
+
+SCRABBLE_RACK_SIZE = 7
@@ -0,0 +1,159 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# A table of the value of every rack leave, the tiles kept on the rack after a move, so that moves
+# can be ranked by their score plus the value of what they leave. A leave holds up to MAX_LEAVE tiles
+# from the 26 letters and the blank. Its tiles are numbered (a to z as 0 to 25, the blank as 26),
+# sorted, and padded to MAX_LEAVE with EMPTY (27), which makes it a multiset of exactly MAX_LEAVE
+# symbols out of 28. Adding i to the i-th symbol turns that into a set of MAX_LEAVE numbers below
+# 33, whose rank in the combinatorial number system, the sum of C(c_i, i + 1), is a dense index from
+# 0 to C(33, 6) - 1. The table is an array of one value per index.
+#
+# The compiled file holds (in the byte order of the machine that built it):
+#
+#	header				MAGIC, then u32 version, byte order mark, entry count and MAX_LEAVE
+#	values				f32 * entry count
+#
+# Usage: python leaves.py leaves.bin
+#
+# builds the table with a heuristic value for every leave (see heuristic_leave_value) and writes it.
+
+import hashlib
+import mmap
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations_with_replacement
+from string import ascii_lowercase
+
+from helper_lists import BLANK
+
+MAGIC = b"SCRBLEAV"
+VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+
+HEADER = struct.Struct("=8s4I")
+
+MAX_LEAVE = 6
+
+# Tile numbers of the leave encoding
+BLANK_SYMBOL = len(ascii_lowercase)
+EMPTY = BLANK_SYMBOL + 1
+TILE_SYMBOLS = {letter: i for i, letter in enumerate(ascii_lowercase)}
+TILE_SYMBOLS[BLANK] = BLANK_SYMBOL
+
+# C(n, k) for the ranks, indexed [k][n], built as Pascal's triangle since math.comb needs Python 3.8
+BINOMIALS = [[1] * (EMPTY + MAX_LEAVE + 1)]
+for k in range(1, MAX_LEAVE + 1):
+	BINOMIALS.append([0] * (EMPTY + MAX_LEAVE + 1))
+	for n in range(1, EMPTY + MAX_LEAVE + 1):
+		BINOMIALS[k][n] = BINOMIALS[k][n - 1] + BINOMIALS[k - 1][n - 1]
+
+LEAVE_COUNT = BINOMIALS[MAX_LEAVE][EMPTY + MAX_LEAVE]
+
+# Returns the index of a leave given as its sorted tile numbers
+def symbols_index(symbols):
+	index = 0
+	for i, symbol in enumerate(symbols):
+		index += BINOMIALS[i + 1][symbol + i]
+	for i in range(len(symbols), MAX_LEAVE):
+		index += BINOMIALS[i + 1][EMPTY + i]
+	return index
+
+# Returns the index of a leave given as tiles in any order
+def leave_index(tiles):
+	if len(tiles) > MAX_LEAVE:
+		raise ValueError("A leave has at most {} tiles, not {}".format(MAX_LEAVE, len(tiles)))
+	return symbols_index(sorted(TILE_SYMBOLS[tile] for tile in tiles))
+
+# Rough values of keeping single tiles, in points, and adjustments for the combinations in a leave
+TILE_LEAVE_VALUES = {
+	"a": 1.0 , "b": -2.0, "c": 0.9 , "d": 0.5 ,
+	"e": 0.4 , "f": -2.2, "g": -2.0, "h": 1.1 ,
+	"i": -0.3, "j": -1.5, "k": -0.8, "l": -0.2,
+	"m": 0.6 , "n": 0.2 , "o": -0.7, "p": -0.2,
+	"q": -7.0, "r": 1.1 , "s": 8.0 , "t": -0.1,
+	"u": -3.5, "v": -5.5, "w": -3.8, "x": 3.3 ,
+	"y": -0.6, "z": 5.1 , "*": 25.6
+}
+DUPLICATE_PENALTY = 2.5
+BALANCE_PENALTY = 2.0
+Q_WITHOUT_U_PENALTY = 5.0
+VOWELS = set("aeiou")
+
+# Returns a heuristic value of a leave: the sum of its tiles' values, less a penalty for each extra
+# copy of a letter, for having more vowels than consonants or the other way round by more than one,
+# and for a q without a u
+def heuristic_leave_value(tiles):
+	value = sum(TILE_LEAVE_VALUES[tile] for tile in tiles)
+
+	counts = {}
+	for tile in tiles:
+		counts[tile] = counts.get(tile, 0) + 1
+	for tile, number in counts.items():
+		if tile != BLANK and number > 1:
+			value -= DUPLICATE_PENALTY * (number - 1)
+
+	vowels = sum(counts.get(vowel, 0) for vowel in VOWELS)
+	consonants = len(tiles) - vowels - counts.get(BLANK, 0)
+	value -= BALANCE_PENALTY * max(abs(vowels - consonants) - 1, 0)
+
+	if "q" in counts and "u" not in counts:
+		value -= Q_WITHOUT_U_PENALTY
+
+	return value
+
+# Returns the values of every leave, by index, as an array of floats
+def build_leave_values(leave_value=heuristic_leave_value):
+	values = array("f", bytes(4 * LEAVE_COUNT))
+	tiles = list(ascii_lowercase) + [BLANK, None]
+	for symbols in combinations_with_replacement(range(EMPTY + 1), MAX_LEAVE):
+		values[symbols_index(symbols)] = leave_value([tiles[symbol] for symbol in symbols if symbol != EMPTY])
+	return values
+
+def write_leave_table(values, path):
+	with open(path, "wb") as f:
+		f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(values), MAX_LEAVE))
+		values.tofile(f)
+
+# The values of a compiled table, memory mapped so that processes on the same machine share its pages
+class LeaveTable:
+	def __init__(self, path):
+		with open(path, "rb") as f:
+			self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		magic, version, byte_order_mark, count, max_leave = HEADER.unpack_from(self.mmap, 0)
+		if magic != MAGIC:
+			raise ValueError("{} is not a leave table".format(path))
+		if version != VERSION:
+			raise ValueError("{} has version {}, expected {}".format(path, version, VERSION))
+		if byte_order_mark != BYTE_ORDER_MARK:
+			raise ValueError("{} was built on a machine with a different byte order".format(path))
+		if count != LEAVE_COUNT or max_leave != MAX_LEAVE:
+			raise ValueError("{} holds {} leaves of up to {} tiles, expected {} of up to {}".format(path, count, max_leave, LEAVE_COUNT, MAX_LEAVE))
+
+		self.values = memoryview(self.mmap)[HEADER.size:HEADER.size + 4 * count].cast("f")
+		# A hash of the values, worked out the first time it is needed (see fingerprint)
+		self.values_fingerprint = None
+
+	# Returns a hash of the table's values, which tells tables apart in the keys of a move cache (see
+	# position_cache)
+	def fingerprint(self):
+		if self.values_fingerprint is None:
+			self.values_fingerprint = hashlib.blake2b(self.mmap, digest_size=16).hexdigest()
+		return self.values_fingerprint
+
+	# Returns the value of a leave given as tiles in any order
+	def value(self, tiles):
+		return self.values[leave_index(tiles)]
+
+if __name__ == "__main__":
+	if len(sys.argv) != 2:
+		print("Usage: python leaves.py <leave table>")
+		sys.exit(1)
+
+	start = time.perf_counter()
+	values = build_leave_values()
+	write_leave_table(values, sys.argv[1])
+	print("Built the values of {} leaves into {} in {:.1f} s".format(len(values), sys.argv[1], time.perf_counter() - start))
@@ -0,0 +1,228 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# A cache of the moves found for positions, so that a position that comes up again, such as a client
+# asking for a hint again or an opening shared between games, is not searched again. Positions are
+# keyed by a Zobrist hash: every feature of a position, a tile on a square, a copy of a tile on the
+# rack, a bonus square, a letter's points, the bingo bonus and the board size, has a random 64 bit
+# key, and the hash of a position is the XOR of the keys of its features. Placing a tile XORs its key
+# in, so the hash of a game is kept up to date as moves are applied without going over the board
+# again. The key of a search is the position's hash XORed with a key for the search, the dictionary's
+# words and the other options of the game that change the moves it finds (see cache_key).
+#
+# Two positions whose hashes collide would share their moves, which with 64 bit keys is unlikely
+# enough to be ignored, as it is in the transposition tables of game playing programs.
+#
+# The cache keeps the most recently used move lists in memory, up to a number of moves in total,
+# evicting the least recently used lists first. With a path, every list is also written to an SQLite
+# database there, which outlives the process and can be shared by several, and a list evicted from
+# memory, or found by another process, is read back from it. The moves are stored as JSON, so reading
+# a cache file that someone else wrote cannot run any code.
+#
+# Usage: python position_cache.py <cache file>
+#
+# prints the number of move lists and moves in a cache file.
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+
+from solver_helper_classes import Move, MoveLetter
+
+# Moves kept in memory by default
+DEFAULT_MAX_MOVES = 1000000
+
+# Keys of the features seen so far (see zobrist_key)
+ZOBRIST_KEYS = {}
+
+# Returns the random 64 bit key of a feature of a position, such as ("tile", x, y, letter). The keys
+# are taken from a hash of the feature rather than from a random number generator, so that they are
+# the same in every process and run, which the database needs.
+def zobrist_key(*feature):
+	key = ZOBRIST_KEYS.get(feature)
+	if key is None:
+		key = int.from_bytes(hashlib.blake2b(repr(feature).encode(), digest_size=8).digest(), "little")
+		ZOBRIST_KEYS[feature] = key
+	return key
+
+# The Zobrist hash of a position, kept as separate parts for the rules, the tiles on the board and the
+# rack, which change at different times
+class PositionHash:
+	def __init__(self, height, width, bonus_placements, letter_points, bingo_bonus):
+		self.rules = zobrist_key("size", height, width) ^ zobrist_key("bingo_bonus", bingo_bonus)
+		for (x, y), bonus in bonus_placements.items():
+			self.rules ^= zobrist_key("bonus", x, y, bonus)
+		for letter, points in letter_points.items():
+			self.rules ^= zobrist_key("points", letter, points)
+		self.board = 0
+		self.rack = 0
+
+	# Adds a tile placed on an empty square
+	def place_tile(self, x, y, tile):
+		self.board ^= zobrist_key("tile", x, y, tile)
+
+	# The rack is a multiset, so its tiles are keyed by how many copies of the tile came before them,
+	# whatever their order
+	def set_rack(self, rack):
+		self.rack = 0
+		copies = {}
+		for tile in rack:
+			number = copies.get(tile, 0)
+			self.rack ^= zobrist_key("rack", tile, number)
+			copies[tile] = number + 1
+
+	def value(self):
+		return self.rules ^ self.board ^ self.rack
+
+	# Returns the hash of the position combined with the options of a search
+	def key(self, *options):
+		return self.value() ^ zobrist_key("options", *options)
+
+# Returns the hash of a position given as it is to Game
+def position_hash(height, width, placed_tiles, bonus_placements, letter_points, bingo_bonus, rack):
+	result = PositionHash(height, width, bonus_placements, letter_points, bingo_bonus)
+	for (x, y), tile in placed_tiles.items():
+		result.place_tile(x, y, tile)
+	result.set_rack(rack)
+	return result
+
+# Returns the name and options of a search, as Solver.solve takes them: the moves that tie for the
+# highest score with best, the top highest scoring ones with top, or every move
+def search_options(top=None, engine=None, best=False, by_equity=False):
+	if best:
+		return ("best",)
+	if top is not None:
+		return ("top", top, engine, by_equity)
+	return ("all", engine)
+
+# Returns the key of the moves found by a search of a position (see search_options). The rest are what
+# else changes the moves any search finds: the dictionary's words (see Dictionary.fingerprint), the
+# lexicons played, whether every blank assignment is kept and the values of the leave table, if any.
+# Every key is made here, so that a Game, a Solver and batch_solver.py give a position the same one.
+def cache_key(position_hash, search, dictionary, lexicon_mask, all_blank_assignments, leave_table):
+	return position_hash.key(*search, dictionary.fingerprint(), lexicon_mask, all_blank_assignments, None if leave_table is None else leave_table.fingerprint())
+
+# The MoveLetters of the moves read from the cache, one for each way of placing each letter, shared
+# like those of the move generator
+MOVE_LETTERS = {}
+
+# A move as the cache stores it, made only of strings and numbers: its word, bitsets of its tiles that
+# were on the board and its blanks, score, direction, start and leave value
+def move_entry(move):
+	placed = blanks = 0
+	for i, move_letter in enumerate(move.letters):
+		if move_letter.already_placed:
+			placed |= 1 << i
+		if move_letter.was_blank:
+			blanks |= 1 << i
+	x, y = move.start_coords
+	return (move.serialize(), placed, blanks, move.score, move.direction, x, y, move.leave_value)
+
+def entry_move(entry):
+	word, placed, blanks, score, direction, x, y, leave_value = entry
+	letters = []
+	for i, letter in enumerate(word):
+		feature = (letter, bool(placed >> i & 1), bool(blanks >> i & 1))
+		move_letter = MOVE_LETTERS.get(feature)
+		if move_letter is None:
+			move_letter = MOVE_LETTERS[feature] = MoveLetter(*feature)
+		letters.append(move_letter)
+
+	move = Move()
+	move.letters, move.score, move.direction, move.start_coords, move.leave_value = tuple(letters), score, direction, (x, y), leave_value
+	return move
+
+# A least recently used cache of move lists by key, holding at most max_moves moves in memory (None for
+# no limit), and also at most max_entries lists if that is given, backed by a database at path if it
+# is given. get returns new Move objects each time, so callers can change them.
+class MoveCache:
+	def __init__(self, max_moves=DEFAULT_MAX_MOVES, max_entries=None, path=None):
+		self.max_moves = max_moves
+		self.max_entries = max_entries
+		self.path = path
+
+		# Lists of move entries by key, least recently used first, and the number of moves in them
+		self.entries = OrderedDict()
+		self.moves = 0
+
+		# The database connection, opened by the process that uses it, since a connection cannot be
+		# shared with a forked process
+		self.connection = None
+		self.connection_pid = None
+
+		# Lookups found in memory, found in the database, and not found, and lists evicted from memory
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def database(self):
+		if self.connection is None or self.connection_pid != os.getpid():
+			self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+			self.connection.execute("CREATE TABLE IF NOT EXISTS move_lists (key TEXT PRIMARY KEY, moves TEXT)")
+			self.connection_pid = os.getpid()
+		return self.connection
+
+	# Returns the moves stored for key, or None if there are none
+	def get(self, key):
+		entries = self.entries.get(key)
+		if entries is not None:
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return [entry_move(entry) for entry in entries]
+
+		if self.path is not None:
+			row = self.database().execute("SELECT moves FROM move_lists WHERE key = ?", ("{:016x}".format(key),)).fetchone()
+			if row is not None:
+				self.disk_hits += 1
+				entries = [tuple(entry) for entry in json.loads(row[0])]
+				self.remember(key, entries)
+				return [entry_move(entry) for entry in entries]
+
+		self.misses += 1
+		return None
+
+	def put(self, key, moves):
+		entries = [move_entry(move) for move in moves]
+		self.remember(key, entries)
+		if self.path is not None:
+			self.database().execute("INSERT OR REPLACE INTO move_lists VALUES (?, ?)", ("{:016x}".format(key), json.dumps(entries, separators=(",", ":"))))
+
+	# Keeps the entries in memory, evicting the least recently used lists while there are too many moves
+	# or lists, which can include these entries if they hold more than max_moves moves
+	def remember(self, key, entries):
+		if key in self.entries:
+			self.moves -= len(self.entries.pop(key))
+		self.entries[key] = entries
+		self.moves += len(entries)
+		while self.entries and (self.max_moves is not None and self.moves > self.max_moves or self.max_entries is not None and len(self.entries) > self.max_entries):
+			evicted_key, evicted = self.entries.popitem(last=False)
+			self.moves -= len(evicted)
+			self.evictions += 1
+
+	def hit_rate(self):
+		lookups = self.hits + self.disk_hits + self.misses
+		return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+	def as_dict(self):
+		return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "evictions": self.evictions,
+			"entries": len(self.entries), "moves": self.moves}
+
+	def __str__(self):
+		return "{} hits, {} disk hits, {} misses ({:.1%} hit rate), {} evictions; {} move lists of {} moves in memory".format(
+			self.hits, self.disk_hits, self.misses, self.hit_rate(), self.evictions, len(self.entries), self.moves)
+
+if __name__ == "__main__":
+	if len(sys.argv) != 2:
+		print("Usage: python position_cache.py <cache file>")
+		sys.exit(1)
+
+	cache = MoveCache(path=sys.argv[1])
+	lists = moves = 0
+	for (data,) in cache.database().execute("SELECT moves FROM move_lists"):
+		lists += 1
+		moves += len(json.loads(data))
+	print("{} move lists of {} moves in {}".format(lists, moves, sys.argv[1]))
@@ -5,8 +5,10 @@
 #
 # Uses dawg implementation by Steve Hanov at http://stevehanov.ca/blog/?id=115
 
+import os
+
 import scrabble_solver_game
-from helper_lists import SCRABBLE_HEIGHT, SCRABBLE_WIDTH, DOUBLE_LETTER, TRIPLE_LETTER, DOUBLE_WORD, TRIPLE_WORD, BLANK, SCRABBLE_BINGO_BONUS, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS, DICTIONARY
+from helper_lists import SCRABBLE_HEIGHT, SCRABBLE_WIDTH, DOUBLE_LETTER, TRIPLE_LETTER, DOUBLE_WORD, TRIPLE_WORD, BLANK, SCRABBLE_BINGO_BONUS, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS, DICTIONARY, COMPILED_DICTIONARY
 
 placed_tiles_1 = {
 	(4, 7): "a",
@@ -23,8 +25,12 @@ current_rack_1 = ["a", "v", "e", "r", "f", "u", "m"]
 
 
 if __name__ == "__main__":
-	game = scrabble_solver_game.Game(SCRABBLE_HEIGHT, SCRABBLE_WIDTH, placed_tiles_1, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS, current_rack_1, SCRABBLE_BINGO_BONUS, DICTIONARY)
+	# Use the compiled dictionary if it has been built, since it loads much faster
+	dictionary_file = COMPILED_DICTIONARY if os.path.exists(COMPILED_DICTIONARY) else DICTIONARY
+	solver = scrabble_solver_game.Solver(SCRABBLE_HEIGHT, SCRABBLE_WIDTH, SCRABBLE_BONUS_PLACEMENTS, SCRABBLE_LETTER_POINTS, SCRABBLE_BINGO_BONUS, dictionary_file)
+	game = solver.new_game(placed_tiles_1, current_rack_1)
 	game.Algorithm()
 	game.print_possible_words()
 	game.print_highest()
-	game.print()
\ No newline at end of file
+	game.print()
+	print(game.stats)
\ No newline at end of file
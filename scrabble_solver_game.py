@@ -7,140 +7,475 @@
 
 from helper_lists import *
 from collections import namedtuple
+from itertools import chain, count
+from operator import attrgetter
 from string import ascii_lowercase
-from copy import deepcopy
+import copy
+import heapq
+import multiprocessing
 
-from solver_helper_classes import Square, Move, MoveLetter, Dictionary
+try:
+	import numpy
+except ImportError: # optional, for score_moves
+	numpy = None
+
+from leaves import MAX_LEAVE, LeaveTable
+from position_cache import PositionHash, cache_key, position_hash, search_options
+from solver_helper_classes import Move, MoveLetter, Dictionary, SearchStats
 
 DOUBLE_LETTER = "dl"
 TRIPLE_LETTER = "tl"
 DOUBLE_WORD = "dw"
 TRIPLE_WORD = "tw"
 
+ACROSS = "across"
+DOWNWARDS = "downwards"
+
+# Move generation engines: Appel and Jacobson's left part and extend right search over the dawg,
+# or Gordon's search outwards from each anchor over the GADDAG
+DAWG_ENGINE = "dawg"
+GADDAG_ENGINE = "gaddag"
+
+# The move letters pushed onto the placement buffer while searching, indexed by letter index for
+# tiles from the rack and by letter for tiles already on the board
+RACK_MOVE_LETTERS = [MoveLetter(letter, False) for letter in ascii_lowercase]
+BLANK_MOVE_LETTERS = [MoveLetter(letter, False, True) for letter in ascii_lowercase]
+BOARD_MOVE_LETTERS = {letter: MoveLetter(letter, True) for letter in ascii_lowercase}
+
+# Letter and word multipliers of each bonus
+LETTER_MULTIPLIERS = {DOUBLE_LETTER: 2, TRIPLE_LETTER: 3}
+WORD_MULTIPLIERS = {DOUBLE_WORD: 2, TRIPLE_WORD: 3}
+
+# Numbers the distinct move letters as score_moves meets them, so that the letters of a batch of moves
+# can be turned into an array of numbers and their points looked up with NumPy
+class MoveLetterCodes(dict):
+	def __missing__(self, move_letter):
+		code = len(self)
+		self[move_letter] = code
+		return code
+
+MOVE_LETTER_CODES = MoveLetterCodes()
+
+# What the branch and bound search needs to know about the row being searched, indexed by x: the
+# multipliers and cross scores of the empty squares (1, 1 and 0 for tiles), and, for each number of
+# tiles left on the rack, the most that the rest of a move from x can add to the main word's letter sum
+# from tiles on the board and from the rack, the best letter multiplier it can reach, the most it can
+# multiply the main word by and add in cross word scores, and the number of empty squares it can cover
+RowBounds = namedtuple("RowBounds", ["letter_multipliers", "word_multipliers", "cross_scores", "tile_sums", "value_sums", "top_letter_multipliers", "word_products", "cross_sums", "squares"])
+
+# The game and engine that the worker processes of Game.Algorithm generate moves for. They are set
+# before the workers are forked, so each worker starts with a copy of the board and shares the pages
+# of the lexicon with the parent. A compiled dawg is memory mapped read only, so its pages stay shared;
+# a Dawg built in memory is shared copy on write.
+worker_game = None
+worker_engine = None
+
+# Generates the moves along one line in a worker process, given as (direction, line index). The moves
+# are sent back as tuples of their fields, which are quicker to pickle than Move objects, along with
+# the SearchStats of the line.
+def generate_row_moves(work_unit):
+	direction, line = work_unit
+	game = worker_game
+	game.possible_moves = []
+	game.move_sink = None
+	game.stats = SearchStats()
+	game.get_algorithm_row(worker_engine)(direction, line)
+	if game.batch_scoring:
+		game.score_moves(game.possible_moves)
+	return [(move.letters, move.score, move.direction, move.start_coords, move.leave_value) for move in game.possible_moves], game.stats
+
+# Returns the letters in a letter mask, in alphabetical order
+def mask_letters(mask):
+	return [letter for letter in ascii_lowercase if mask & LETTER_BITS[letter]]
+
 # Class to define a scrabble game
 class Game:
 
-	def __init__(self, height, width, placed_tiles, bonus_placements, letter_points, current_rack, bingo_bonus, dictionary_file, debug=False):
-		self.dictionary = Dictionary(dictionary_file)
+	def __init__(self, height, width, placed_tiles, bonus_placements, letter_points, current_rack, bingo_bonus, dictionary_file, debug=False, dictionary=None, leave_table=None, lexicons=None):
+		# An already loaded dictionary can be passed in to skip loading dictionary_file
+		if dictionary is None:
+			dictionary = Dictionary(dictionary_file)
+		self.dictionary = dictionary
+		# The dawg (or compiled dawg) that the move generator walks
+		self.lexicon = self.dictionary.dawg
+		# The bitset of the dictionary's lexicons whose words can be played, given by lexicons as a name
+		# or a list of names, or every lexicon if it is None. Only the test for the end of a word
+		# depends on it, since the lexicons share the dawg's paths.
+		self.lexicon_mask = self.dictionary.lexicon_mask(lexicons)
 		self.debug = debug
 
 		self.letter_points = letter_points
 		self.bingo_bonus = bingo_bonus
 		self.board_is_blank = len(placed_tiles) == 0
 
-		# Board is indexed [x, y] starting from [0, 0] in the top left corner
-		self.create_board(height, width, placed_tiles, bonus_placements)
+		# The LeaveTable that gives each move the value of the tiles it leaves on the rack, if any
+		self.leave_table = leave_table
+
+		# The Zobrist hash of the rules, board and rack, kept up to date as tiles are placed and the
+		# rack is set, which keys the moves of the game in move_cache
+		self.position_hash = PositionHash(height, width, bonus_placements, letter_points, bingo_bonus)
+		# The MoveCache that top_moves and best_moves look their moves up in and add them to, if any
+		self.move_cache = None
+
+		# The board is stored as flat row major lists, indexed by square (see square_index), starting
+		# from [0, 0] in the top left corner
 		self.height = height
 		self.width = width
+		self.create_board(height, width, placed_tiles, bonus_placements)
 
-		# Variable to keep track of whether or not the board is transposed
-		self.transposed = False 
+		# The line of the board that moves are being searched along (see set_line)
+		self.direction = ACROSS
+		self.line = 0
+		self.line_length = 0
+		self.line_tiles = []
+		self.line_bonuses = []
+		self.line_cross_checks = []
+		self.line_cross_scores = []
 
 		self.possible_moves = []
 
+		# The letters of the move being searched, from left to right. The search pushes and pops
+		# letters as it goes, and a Move is only created when a legal move is found.
+		self.placement = []
+		# The GADDAG engine's letters of the move being searched, by position along the line (see
+		# GaddagAlgorithmRow)
+		self.line_placement = []
+
+		# Where LegalMove sends the moves it finds, when they are not to be added to possible_moves
+		self.move_sink = None
+
+		# Whether to find a move for every way of playing the blanks on the rack, instead of only the
+		# highest scoring one for each placement of letters (see assign_blanks)
+		self.all_blank_assignments = False
+
+		# Whether Algorithm scores the moves it adds to possible_moves all at once when it is done (see
+		# score_moves), instead of one at a time as they are found. Moves sent to a move_sink are
+		# always scored as they are found.
+		self.batch_scoring = False
+
+		# Branch and bound state used by best_moves: whether to prune, the best score found so far and
+		# the RowBounds of the row being searched
+		self.pruning = False
+		self.best_score = -1
+		self.row_bounds = None
+
+		# What the search has done and how long each phase took (see SearchStats)
+		self.stats = SearchStats()
+
 		# Evaluate both horizontal and vertical cross checks and cross scores
-		self.print_debug_statement("Calculating horizontal cross checks and scores")
-		self.eval_cross_checks_and_scores()
-		self.transpose()
-		self.print_debug_statement("Calculating vertical cross checks and scores")
-		self.eval_cross_checks_and_scores()
-		self.transpose()
+		with self.stats.timer("cross_checks"):
+			self.eval_cross_checks_and_scores()
+
+		# The tile runs of each line searched so far, keyed by (direction, line) (see get_tile_runs)
+		self.tile_runs = {}
 
-		self.current_rack = current_rack
 		self.bonus_placements = bonus_placements
+		self.set_rack(current_rack)
+
+	# Returns a copy of the game that moves can be applied to without changing this one. The board
+	# lists that apply_move changes are copied, everything else is shared.
+	def copy(self):
+		game = copy.copy(self)
+		for name in ("tiles", "h_cross_checks", "v_cross_checks", "h_cross_scores", "v_cross_scores", "row_occupancy", "column_occupancy", "rack_counts"):
+			setattr(game, name, list(getattr(self, name)))
+		game.tile_runs = dict(self.tile_runs)
+		game.position_hash = copy.copy(self.position_hash)
+		game.current_rack = list(self.current_rack)
+		game.possible_moves = []
+		game.placement = []
+		game.move_sink = None
+		game.stats = SearchStats()
+		return game
+
+	# Changes the lexicons whose words can be played (see lexicon_mask). The cross checks are evaluated
+	# again. The tile runs stay, since the dawg nodes they end on do not depend on the lexicons.
+	def set_lexicons(self, lexicons):
+		self.lexicon_mask = self.dictionary.lexicon_mask(lexicons)
+		with self.stats.timer("cross_checks"):
+			self.eval_cross_checks_and_scores()
+		self.possible_moves = []
+
+	def set_rack(self, current_rack):
+		self.current_rack = current_rack
+		self.position_hash.set_rack(current_rack)
+
+		# While searching, the rack is kept as a count of each letter, a count of blanks and a mask
+		# of the letters with a nonzero count
+		self.rack_counts = [0] * len(ascii_lowercase)
+		self.rack_blanks = 0
+		self.rack_mask = 0
+		self.rack_size = len(current_rack)
+		for tile in current_rack:
+			if tile == BLANK:
+				self.rack_blanks += 1
+			else:
+				self.rack_counts[ord(tile) - ord("a")] += 1
+				self.rack_mask |= LETTER_BITS[tile]
+		self.rack_blank_count = self.rack_blanks
+
+		# What a blank played as each letter can be worth to the score bound of best_moves. The move's
+		# blanks are moved by assign_blanks, which can swap a blank with a copy of its letter from the
+		# rack, so a blank is bounded by its letter's value if the letter is on the rack and is
+		# worth nothing otherwise. A blank still on the rack is bounded by the highest letter value on it.
+		self.blank_letter_values = [self.letter_points[letter] if self.rack_counts[i] else 0 for i, letter in enumerate(ascii_lowercase)]
+		self.rack_blank_value = max(self.blank_letter_values)
+
+		# Tile values on the rack from highest to lowest, for the score bound of best_moves
+		self.rack_values = sorted((self.rack_blank_value if tile == BLANK else self.letter_points[tile] for tile in current_rack), reverse=True)
+		self.rack_value_sum = sum(self.rack_values)
+
+		if self.leave_table is not None:
+			self.set_rack_leaves()
+
+	# Looks up the value of every leave of the rack, so that LegalMove can find the value of a move's
+	# leave with one list lookup. The tiles a move takes from the rack are numbered in mixed radix,
+	# with a digit for each kind of tile on the rack counting how many of it are used: a used tile adds
+	# its kind's weight, the product of the number of ways of using each kind before it.
+	def set_rack_leaves(self):
+		rack_tiles = sorted(set(self.current_rack))
+		rack_counts = [self.current_rack.count(tile) for tile in rack_tiles]
+
+		self.leave_weights = {}
+		weight = 1
+		for tile, number in zip(rack_tiles, rack_counts):
+			self.leave_weights[tile] = weight
+			weight *= number + 1
+
+		self.rack_leave_values = []
+		for used in range(weight):
+			leave = []
+			for tile, number in zip(rack_tiles, rack_counts):
+				leave.extend([tile] * (number - used % (number + 1)))
+				used //= number + 1
+			# Only a move of no tiles could leave more, and there are none
+			self.rack_leave_values.append(self.leave_table.value(leave) if len(leave) <= MAX_LEAVE else 0.0)
 
 	def create_board(self, height, width, placed_tiles, bonus_placements):
-		self.board = []
-		for i in range(width):
-			self.board.append([])
-			for j in range(height):
-				# Initialize a new square with blank information
-				new_square = Square(None, None)
-				self.board[i].append(new_square)
+		squares = height * width
+		self.tiles = [None] * squares
+		self.bonuses = [None] * squares
+
+		# Masks of the letters that can be placed on each square (see LETTER_BITS) and the points of
+		# the tiles beside it: the tiles to its left and right make the h cross checks and score,
+		# which constrain moves downwards, and the tiles above and below it make the v ones, which
+		# constrain moves across
+		self.h_cross_checks = [0] * squares
+		self.v_cross_checks = [0] * squares
+		self.h_cross_scores = [0] * squares
+		self.v_cross_scores = [0] * squares
+
+		# Occupancy bitboards: bit x of row_occupancy[y], and bit y of column_occupancy[x], is set when
+		# square (x, y) has a tile
+		self.row_occupancy = [0] * height
+		self.column_occupancy = [0] * width
 
 		self.insert_tiles(placed_tiles)
 		self.insert_bonuses(bonus_placements)
 
+	# Returns the index of square (x, y) in the board lists
+	def square_index(self, x, y):
+		return y * self.width + x
+
 	def insert_tiles(self, tiles):
 		for coords, tile in tiles.items():
-			self.board[coords[0]][coords[1]].tile = tile
+			self.place_tile(coords[0], coords[1], tile)
+
+	# Puts a tile on an empty square. An occupied square has no cross checks or cross score, as in a
+	# board evaluated from scratch, so the ones left from when it was empty are cleared.
+	def place_tile(self, x, y, tile):
+		square = self.square_index(x, y)
+		self.tiles[square] = tile
+		self.h_cross_checks[square] = self.v_cross_checks[square] = 0
+		self.h_cross_scores[square] = self.v_cross_scores[square] = 0
+		self.position_hash.place_tile(x, y, tile)
+		self.row_occupancy[y] |= 1 << x
+		self.column_occupancy[x] |= 1 << y
 
 	def insert_bonuses(self, bonuses):
-		self.print_debug_statement("inserting bonuses")
+		self.trace("inserting bonuses")
 		for coords, bonus in bonuses.items():
-			self.print_debug_statement("Coords are {}, {} and bonus is: {}".format(coords[0], coords[1], bonus))
-			self.board[coords[0]][coords[1]].bonus = bonus
+			self.trace("Coords are {}, {} and bonus is: {}", coords[0], coords[1], bonus)
+			self.bonuses[self.square_index(coords[0], coords[1])] = bonus
 
 	def eval_cross_checks_and_scores(self):
+		self.trace("Calculating horizontal cross checks and scores")
 		for i in range(self.width):
 			for j in range(self.height):
-				self.print_debug_statement("Calculating cross checks for {},{}".format(i, j))
-				if self.board[i][j].tile:
-					continue
+				self.eval_square_cross_checks(i, j, ACROSS)
 
-				# Initialize strings to hold left and right sides	
-				left, right = "", ""
-				left_index, right_index = i - 1, i + 1
-
-				# Loops to either side, adding tiles to the strings and their point value to
-				# the cross score.
-				while (left_index >= 0 and self.board[left_index][j].tile):
-					left = self.board[left_index][j].tile + left
-					self.board[i][j].h_cross_score += self.letter_points[self.board[left_index][j].tile]
-					left_index -= 1
+		self.trace("Calculating vertical cross checks and scores")
+		for i in range(self.width):
+			for j in range(self.height):
+				self.eval_square_cross_checks(i, j, DOWNWARDS)
 
-				while (right_index < self.width and self.board[right_index][j].tile):
-					right = right + self.board[right_index][j].tile
-					self.board[i][j].h_cross_score += self.letter_points[self.board[right_index][j].tile]
-					right_index += 1 
+	# Evaluates the cross checks and cross score of a square from the tiles beside it in the given
+	# direction: the tiles to its left and right make the h cross checks and score, the tiles above
+	# and below it make the v ones
+	def eval_square_cross_checks(self, i, j, direction):
+		if self.debug:
+			self.trace("Calculating {} cross checks for {},{}", direction, i, j)
+		square = self.square_index(i, j)
+		tiles = self.tiles
+		if tiles[square]:
+			return
 
-				self.print_debug_statement("Left: {}".format(left))
-				self.print_debug_statement("Right: {}".format(right))
+		# Walk along the line through the square: pos is the position along it and step the distance
+		# between neighbouring squares in the board lists
+		if direction == ACROSS:
+			pos, length, step = i, self.width, 1
+		else:
+			pos, length, step = j, self.height, self.width
+
+		# Find the squares just past the tiles on either side, adding the tiles' point values to the
+		# cross score
+		cross_score = 0
+		left_pos, left_square = pos - 1, square - step
+		while left_pos >= 0 and tiles[left_square]:
+			cross_score += self.letter_points[tiles[left_square]]
+			left_pos, left_square = left_pos - 1, left_square - step
+
+		right_pos, right_square = pos + 1, square + step
+		while right_pos < length and tiles[right_square]:
+			cross_score += self.letter_points[tiles[right_square]]
+			right_pos, right_square = right_pos + 1, right_square + step
+
+		has_left = left_pos != pos - 1
+		has_right = right_pos != pos + 1
+		reversed_lexicon = self.dictionary.get_reversed_lexicon()
+		lexicon_mask = self.lexicon_mask
+
+		# A blank can be placed wherever the letter it stands for can, so it needs no bit of its own
+		if not has_left and not has_right:
+			# If there is neither a left nor right, add all letters
+			cross_checks = ALL_LETTERS_MASK
+		elif not has_left and reversed_lexicon is not None:
+			# With only tiles to the right, read them backwards from the end in the reversed lexicon.
+			# A letter fits if it then ends a reversed word.
+			cross_checks = 0
+			node = reversed_lexicon.root
+			x = right_square - step
+			while node is not None and x != square:
+				node = reversed_lexicon.child(node, tiles[x])
+				x -= step
+			if node is not None:
+				candidates = reversed_lexicon.child_mask(node) & ALL_LETTERS_MASK
+				while candidates:
+					bit = candidates & -candidates
+					candidates ^= bit
+					if reversed_lexicon.is_final(reversed_lexicon.child(node, ascii_lowercase[bit.bit_length() - 1]), lexicon_mask):
+						cross_checks |= bit
+		else:
+			# Walk the dawg along the tiles to the left, then follow each letter that continues them
+			# through the tiles to the right. A letter fits if that ends on a word.
+			lexicon = self.lexicon
+			cross_checks = 0
+			node = lexicon.root
+			x = left_square + step
+			while node is not None and x != square:
+				node = lexicon.child(node, tiles[x])
+				x += step
+			if node is not None:
+				candidates = lexicon.child_mask(node)
+				while candidates:
+					bit = candidates & -candidates
+					candidates ^= bit
+					next_node = lexicon.child(node, ascii_lowercase[bit.bit_length() - 1])
+					x = square + step
+					while next_node is not None and x != right_square:
+						next_node = lexicon.child(next_node, tiles[x])
+						x += step
+					if next_node is not None and lexicon.is_final(next_node, lexicon_mask):
+						cross_checks |= bit
+
+		if direction == ACROSS:
+			self.h_cross_checks[square] = cross_checks
+			self.h_cross_scores[square] = cross_score
+		else:
+			self.v_cross_checks[square] = cross_checks
+			self.v_cross_scores[square] = cross_score
 
-				# If there is neither a left nor right, add all letters
-				if not left and not right:
-					self.board[i][j].h_cross_checks = set(ascii_lowercase)
-				else:
-					# Check if each letter can be placed in the spot
-					for letter in ascii_lowercase:
-						potential_word = left + letter + right
-						if self.dictionary.check_word(potential_word):
-							self.print_debug_statement("{} is a potential word!".format(potential_word))
-							self.board[i][j].h_cross_checks.add(letter)
+		if self.debug:
+			self.trace("Cross checks are: {}", ", ".join(mask_letters(cross_checks)))
+			self.trace("Cross score is: {}", cross_score)
+
+	# Places the tiles of a move on the board. Only the squares whose row or column runs were touched
+	# get their cross checks and cross scores updated: the empty squares at either end of the runs
+	# through each new tile. The anchors follow from the occupancy bitboards, and the tile runs of the
+	# rows and columns of the new tiles are dropped to be found again when they are next searched.
+	def apply_move(self, move):
+		step_x, step_y = (1, 0) if move.direction == ACROSS else (0, 1)
+		x, y = move.start_coords
+
+		new_tiles = []
+		for move_letter in move.letters:
+			if not move_letter.already_placed:
+				self.place_tile(x, y, move_letter.letter)
+				new_tiles.append((x, y))
+			x, y = x + step_x, y + step_y
 
-				# If there are any letters in the cross check, we can add the blank
-				if len(self.board[i][j].h_cross_checks) > 0:
-					self.board[i][j].h_cross_checks.add("*")
+		if not new_tiles:
+			return
 
-				self.print_debug_statement(len(self.board[i][j].h_cross_checks))
+		self.board_is_blank = False
 
-				self.print_debug_statement("Cross checks are: {}".format(', '.join(self.board[i][j].h_cross_checks)))
-				self.print_debug_statement("Cross score is: {}".format(self.board[i][j].h_cross_score))
+		# Find the empty square at each end of the horizontal and vertical runs through the new tiles
+		cross_check_squares = set()
+		for x, y in new_tiles:
+			for direction, step_x, step_y in ((ACROSS, 1, 0), (ACROSS, -1, 0), (DOWNWARDS, 0, 1), (DOWNWARDS, 0, -1)):
+				end_x, end_y = x + step_x, y + step_y
+				while 0 <= end_x < self.width and 0 <= end_y < self.height and self.tiles[self.square_index(end_x, end_y)]:
+					end_x, end_y = end_x + step_x, end_y + step_y
+				if 0 <= end_x < self.width and 0 <= end_y < self.height:
+					cross_check_squares.add((end_x, end_y, direction))
 
-	def transpose(self):
-		# Transposes the board itself
-		self.board = [*zip(*self.board)]
+		with self.stats.timer("cross_checks"):
+			for x, y, direction in cross_check_squares:
+				self.eval_square_cross_checks(x, y, direction)
 
-		# Switch height and width
-		self.height, self.width = self.width, self.height
+		for x, y in new_tiles:
+			self.tile_runs.pop((ACROSS, y), None)
+			self.tile_runs.pop((DOWNWARDS, x), None)
 
-		# Switch the horizontal and vertical cross checks and scores
-		for i in range(self.width):
-			for j in range(self.height):
-				self.board[i][j].switch_cross_checks()
-				self.board[i][j].switch_cross_scores()
+		# Moves found for the previous board no longer apply
+		self.possible_moves = []
 
-		# Update tranpose variable
-		self.transposed = not self.transposed
+	# Number of lines that moves in the direction are searched along: rows across, columns downwards
+	def line_count(self, direction):
+		return self.height if direction == ACROSS else self.width
+
+	# Selects the line that moves are searched along, row line for moves across or column line for moves
+	# downwards. The search works with positions along the line, reading its squares from lists sliced
+	# out of the board lists with a stride, along with the cross checks and scores made by the tiles
+	# beside the line.
+	def set_line(self, direction, line):
+		if direction == ACROSS:
+			start, stride, length = line * self.width, 1, self.width
+			cross_checks, cross_scores = self.v_cross_checks, self.v_cross_scores
+		else:
+			start, stride, length = line, self.width, self.height
+			cross_checks, cross_scores = self.h_cross_checks, self.h_cross_scores
+		end = start + stride * length
+
+		self.direction = direction
+		self.line = line
+		self.line_length = length
+		self.line_tiles = self.tiles[start:end:stride]
+		self.line_bonuses = self.bonuses[start:end:stride]
+		self.line_cross_checks = cross_checks[start:end:stride]
+		self.line_cross_scores = cross_scores[start:end:stride]
+
+	# Returns the board coordinates of a position along the current line
+	def line_coords(self, x):
+		return (x, self.line) if self.direction == ACROSS else (self.line, x)
 
 	def print(self):
 		print("          " + "    ".join(map(str, range(self.width))))
 		for j in range(self.height):
 			hor_string = str(j) + "\t"
 			for i in range(self.width):
-				tile = self.board[i][j].tile
+				tile = self.tiles[self.square_index(i, j)]
 				if not tile:
-					bonus = self.board[i][j].bonus
+					bonus = self.bonuses[self.square_index(i, j)]
 					if bonus:
 						tile = "~" + bonus
 					else:
@@ -155,61 +490,387 @@ class Game:
 		print("printing elaborate")
 		for j in range(self.height):
 			for i in range(self.width):
+				square = self.square_index(i, j)
 				hor_string = ""
-				tile = self.board[i][j].tile
+				tile = self.tiles[square]
 				if not tile:
 					tile = " "
 				hor_string += str(i) + ", " + str(j) + " " + tile + " "
-				if self.board[i][j].bonus:
-					hor_string += self.board[i][j].bonus + " "
-				hor_string += "H cross checks: {} ".format(', '.join(self.board[i][j].h_cross_checks)) + " "
-				hor_string += "V cross checks: {}".format(', '.join(self.board[i][j].v_cross_checks)) + " "
-				hor_string += "H cross score: {}".format(self.board[i][j].h_cross_score) + " "
-				hor_string += "V cross score: {}".format(self.board[i][j].v_cross_score)
+				if self.bonuses[square]:
+					hor_string += self.bonuses[square] + " "
+				hor_string += "H cross checks: {} ".format(', '.join(mask_letters(self.h_cross_checks[square]))) + " "
+				hor_string += "V cross checks: {}".format(', '.join(mask_letters(self.v_cross_checks[square]))) + " "
+				hor_string += "H cross score: {}".format(self.h_cross_scores[square]) + " "
+				hor_string += "V cross score: {}".format(self.v_cross_scores[square])
 				print(hor_string)
 
-	def get_anchors(self, row_index):
+	# Returns a mask of the anchors along the current line, the empty squares next to a tile that every
+	# move but the first has to cover. Bit x is set for the anchor at position x.
+	def get_anchor_mask(self):
+		lines = self.row_occupancy if self.direction == ACROSS else self.column_occupancy
+		occupied = lines[self.line]
+
+		# Squares with a tile beside them along the line, or in the lines on either side
+		touching = occupied << 1 | occupied >> 1
+		if self.line > 0:
+			touching |= lines[self.line - 1]
+		if self.line < len(lines) - 1:
+			touching |= lines[self.line + 1]
+
+		return touching & ~occupied & ((1 << self.line_length) - 1)
+
+	# Returns the positions of the anchors along the current line, from left to right
+	def get_anchors(self):
 		anchors = []
+		mask = self.get_anchor_mask()
+		while mask:
+			bit = mask & -mask
+			mask ^= bit
+			anchors.append(bit.bit_length() - 1)
+		return anchors
 
-		# Loops through a row
-		for i in range(self.width):
-			# If tile, not an anchor
-			if self.board[i][row_index].tile:
+	# Returns the runs of tiles along the current line that a move can extend to the right, as a dict
+	# from the position of the empty square just right of the run to the dawg node at the end of the
+	# run's letters and the run's letters as a placement. Runs that do not start a word are left out.
+	# The runs of each line are found once and kept until a move is played across the line.
+	def get_tile_runs(self):
+		key = (self.direction, self.line)
+		runs = self.tile_runs.get(key)
+		if runs is not None:
+			return runs
+
+		runs = {}
+		line_tiles = self.line_tiles
+		x = 0
+		while x < self.line_length:
+			if not line_tiles[x]:
+				x += 1
 				continue
-			is_anchor = False
-			# Make sure not at the left edge
-			if i > 0:
-				if self.board[i-1][row_index].tile:
-					is_anchor = True
-			# Make sure not at the right edge
-			if i < self.width - 1:
-				if self.board[i+1][row_index].tile:
-					is_anchor = True
-			# Make sure not at the top row
-			if row_index > 0:
-				if self.board[i][row_index-1].tile:
-					is_anchor = True
-			# Make sure not at the bottom row
-			if row_index < self.height - 1:
-				if self.board[i][row_index+1].tile:
-					is_anchor = True
-
-			if is_anchor:
-				anchors.append((i, row_index))
+			start = x
+			while x < self.line_length and line_tiles[x]:
+				x += 1
+			if x < self.line_length:
+				prefix = "".join(line_tiles[start:x])
+				prefix_node = self.dictionary.attempt_trace_prefix(prefix)
+				if prefix_node is not None:
+					runs[x] = (prefix_node, tuple(BOARD_MOVE_LETTERS[letter] for letter in prefix))
+
+		self.tile_runs[key] = runs
+		return runs
+
+	# With more than one worker the rows are shared out to a pool of worker processes (see
+	# parallel_algorithm)
+	def Algorithm(self, engine=DAWG_ENGINE, workers=1):
+		if workers > 1:
+			self.parallel_algorithm(workers, engine)
+			return
 
-		return anchors
+		algorithm_row = self.get_algorithm_row(engine)
+		first_move = len(self.possible_moves)
+
+		# Search every row for moves across, then every column for moves downwards
+		with self.stats.timer("move_generation"):
+			for direction in (ACROSS, DOWNWARDS):
+				for line in range(self.line_count(direction)):
+					algorithm_row(direction, line)
+
+		if self.batch_scoring and self.move_sink is None:
+			with self.stats.timer("scoring"):
+				self.score_moves(self.possible_moves[first_move:])
 
-	def Algorithm(self):
-		# Call the horizontal version of the algorithm, tranpose, call the algorithm again, then transpose back
-		self.AlgorithmHorizontal()
-		self.transpose()
-		self.AlgorithmHorizontal()
-		self.transpose()
+	# Generates the moves like Algorithm, with each row of both orientations searched by one of a pool of
+	# worker processes. The moves of each row are added in the order that Algorithm would find them,
+	# so the result does not depend on the number of workers or on which worker finishes first. Needs
+	# the fork start method, without which the rows are searched in this process.
+	def parallel_algorithm(self, workers, engine=DAWG_ENGINE):
+		global worker_game, worker_engine
+
+		if "fork" not in multiprocessing.get_all_start_methods():
+			self.Algorithm(engine)
+			return
+
+		# Build the GADDAG before forking so that the workers do not each build their own
+		if engine == GADDAG_ENGINE:
+			self.dictionary.get_gaddag()
+		work_units = [(direction, line) for direction in (ACROSS, DOWNWARDS) for line in range(self.line_count(direction))]
+
+		worker_game, worker_engine = self, engine
+		try:
+			with self.stats.timer("move_generation"), multiprocessing.get_context("fork").Pool(workers) as pool:
+				row_moves = pool.map(generate_row_moves, work_units, chunksize=1)
+		finally:
+			worker_game, worker_engine = None, None
+
+		for moves, row_stats in row_moves:
+			self.stats.add(row_stats)
+			for letters, score, direction, start_coords, leave_value in moves:
+				move = Move()
+				move.letters, move.score, move.direction, move.start_coords, move.leave_value = letters, score, direction, start_coords, leave_value
+				if self.move_sink is None:
+					self.possible_moves.append(move)
+				else:
+					self.move_sink(move)
+
+	# Returns the function that generates the moves along one line of the board for an engine
+	def get_algorithm_row(self, engine):
+		if engine == DAWG_ENGINE:
+			return self.AlgorithmRow
+		elif engine == GADDAG_ENGINE:
+			return self.GaddagAlgorithmRow
+		raise ValueError("Unknown move generation engine: {}".format(engine))
+
+	# Generates moves like Algorithm, but yields them as they are found instead of adding them to
+	# possible_moves. Only the moves of one row are held at a time.
+	def iter_moves(self, engine=DAWG_ENGINE):
+		algorithm_row = self.get_algorithm_row(engine)
+		found = []
+		self.move_sink = found.append
+		try:
+			for direction in (ACROSS, DOWNWARDS):
+				for line in range(self.line_count(direction)):
+					algorithm_row(direction, line)
+					yield from found
+					found.clear()
+		finally:
+			self.move_sink = None
+
+	# Returns the key of the moves found by a search of the game's position, where search names the
+	# search and its options (see position_cache.search_options)
+	def cache_key(self, search):
+		return cache_key(self.position_hash, search, self.dictionary, self.lexicon_mask, self.all_blank_assignments, self.leave_table)
+
+	# Returns the moves that the search function returns, or, with a move_cache, the moves it returned
+	# for the same position and search before
+	def cached_moves(self, search, search_function):
+		if self.move_cache is None:
+			return search_function()
+		key = self.cache_key(search)
+		moves = self.move_cache.get(key)
+		if moves is None:
+			moves = search_function()
+			self.move_cache.put(key, moves)
+		return moves
+
+	# Returns the k highest scoring moves, highest first, keeping only k moves in memory at a time
+	# instead of collecting and sorting every move. Ties go to the move found first. With by_equity
+	# the moves are ranked by their score plus the value of their leave (see leave_table).
+	def top_moves(self, k, engine=DAWG_ENGINE, by_equity=False):
+		if k <= 0:
+			return []
+		return self.cached_moves(search_options(top=k, engine=engine, by_equity=by_equity), lambda: self.search_top_moves(k, engine, by_equity))
+
+	def search_top_moves(self, k, engine, by_equity):
+		# Min heap of (score, -order, move), so the worst of the kept moves is on top
+		heap = []
+		order = count()
+		def keep(move):
+			entry = (move.equity() if by_equity else move.score, -next(order), move)
+			if len(heap) < k:
+				heapq.heappush(heap, entry)
+			elif entry > heap[0]:
+				heapq.heapreplace(heap, entry)
+
+		self.move_sink = keep
+		try:
+			self.Algorithm(engine)
+		finally:
+			self.move_sink = None
+
+		return [move for score, order, move in sorted(heap, reverse=True)]
+
+	# Returns the highest scoring moves with the dawg engine, like return_highest after Algorithm, or an
+	# empty list if there are none. Branches of the search whose score bound is below the best score
+	# found so far are cut off, so every move that ties for the best is still found.
+	def best_moves(self):
+		return self.cached_moves(search_options(best=True), self.search_best_moves)
+
+	def search_best_moves(self):
+		best = []
+		def keep(move):
+			if move.score > self.best_score:
+				self.best_score = move.score
+				best.clear()
+			if move.score == self.best_score:
+				best.append(move)
+
+		self.best_score = -1
+		self.pruning = True
+		self.move_sink = keep
+		try:
+			# Search the lines that have moves, in both directions, from the highest score bound down,
+			# so that high scoring moves are found early and the rest of the search is cut off sooner.
+			# Every move starts on some square of its line, so a line can be skipped once the bound of
+			# every square is below the best score.
+			start_partial = self.start_score()
+			lines = []
+			with self.stats.timer("row_bounds"):
+				for direction in (ACROSS, DOWNWARDS):
+					center = int(self.line_count(direction)/2)
+					for line in range(self.line_count(direction)):
+						self.set_line(direction, line)
+						if self.board_is_blank and line != center or not self.board_is_blank and not self.get_anchor_mask():
+							continue
+						row_bounds = self.get_row_bounds()
+						self.row_bounds = row_bounds
+						lines.append((max(self.score_bound(start_partial, x) for x in range(self.line_length)), direction, line, row_bounds))
+				lines.sort(key=lambda line: line[0], reverse=True)
+
+			with self.stats.timer("move_generation"):
+				for bound, direction, line, row_bounds in lines:
+					if bound < self.best_score:
+						self.stats.pruned_branches += 1
+						break
+					self.row_bounds = row_bounds
+					self.AlgorithmRow(direction, line)
+		finally:
+			self.pruning = False
+			self.move_sink = None
+			self.row_bounds = None
+
+		return best
+
+	# Returns the RowBounds of the current line. The rest of a move from x with tiles tiles left can
+	# at most cover the next tiles empty squares that a tile from the rack fits on, and run on to
+	# the end of the tiles after them. Its bound puts the highest tile values on the rack on the
+	# highest letter multipliers of those squares, unless the highest value that fits on each square
+	# gives less, and takes every word multiplier and cross word among them.
+	def get_row_bounds(self):
+		# The letters that the rack can play, and the highest value of a tile that can be played on each
+		# empty square (None if no tile fits, which ends any move before the square)
+		playable = ALL_LETTERS_MASK if self.rack_blanks else self.rack_mask
+		length = self.line_length
+		square_values = []
+		letter_multipliers, word_multipliers, cross_scores = [], [], []
+		for x in range(length):
+			if self.line_tiles[x]:
+				letter_multipliers.append(1)
+				word_multipliers.append(1)
+				cross_scores.append(0)
+				square_values.append(0)
+			else:
+				letter_multipliers.append(LETTER_MULTIPLIERS.get(self.line_bonuses[x], 1))
+				word_multipliers.append(WORD_MULTIPLIERS.get(self.line_bonuses[x], 1))
+				cross_scores.append(self.line_cross_scores[x])
+				fits = self.line_cross_checks[x] & playable
+				if not fits:
+					square_values.append(None)
+				else:
+					# Letters only reachable through a blank are worth nothing
+					fits &= self.rack_mask
+					square_values.append(max((self.letter_points[letter] for letter in mask_letters(fits)), default=0))
+
+		rack_values = self.rack_values
+		tile_sums, value_sums, top_letter_multipliers, word_products, cross_sums, squares = [], [], [], [], [], []
+		for x in range(length):
+			tile_sums.append([])
+			value_sums.append([])
+			top_letter_multipliers.append([])
+			word_products.append([])
+			cross_sums.append([])
+			squares.append([])
+			# Walk right from x, recording the bound for tiles tiles left when the next empty square
+			# would need a tile more than that
+			tile_sum, capped_sum, word_product, cross_sum = 0, 0, 1, 0
+			covered_multipliers = []
+			for end_x in range(x, length + 1):
+				tile = self.line_tiles[end_x] if end_x < length else None
+				if tile:
+					tile_sum += self.letter_points[tile]
+					continue
+				# A square that no tile fits stops the move like the edge does
+				blocked = end_x == length or square_values[end_x] is None
+				covered_multipliers.sort(reverse=True)
+				tile_sums[x].append(tile_sum)
+				value_sums[x].append(min(capped_sum, sum(value * multiplier for value, multiplier in zip(rack_values, covered_multipliers))))
+				top_letter_multipliers[x].append(covered_multipliers[0] if covered_multipliers else 1)
+				word_products[x].append(word_product)
+				cross_sums[x].append(cross_sum)
+				squares[x].append(len(covered_multipliers))
+				if blocked or len(covered_multipliers) == self.rack_size:
+					break
+				covered_multipliers.append(letter_multipliers[end_x])
+				capped_sum += square_values[end_x] * letter_multipliers[end_x]
+				word_product *= word_multipliers[end_x]
+				if cross_scores[end_x]:
+					cross_sum += (cross_scores[end_x] + square_values[end_x] * letter_multipliers[end_x]) * word_multipliers[end_x]
+			# Near the end of the row more tiles cannot cover any more squares
+			for tiles in range(len(squares[x]), self.rack_size + 1):
+				tile_sums[x].append(tile_sums[x][-1])
+				value_sums[x].append(value_sums[x][-1])
+				top_letter_multipliers[x].append(top_letter_multipliers[x][-1])
+				word_products[x].append(word_products[x][-1])
+				cross_sums[x].append(cross_sums[x][-1])
+				squares[x].append(squares[x][-1])
+
+		return RowBounds(letter_multipliers, word_multipliers, cross_scores, tile_sums, value_sums, top_letter_multipliers, word_products, cross_sums, squares)
+
+	# The branch and bound search carries the score of the placement so far as a tuple of the letter sum
+	# and multiplier of the main word, the sum of the cross word scores, the number of new tiles and the
+	# total point value of the tiles left on the rack. Adds a letter of the given point value, placed at
+	# x, to such a score the way score_move does. A blank is given its value in blank_letter_values, and
+	# takes rack_blank_value off the rack.
+	def add_letter_score(self, partial, letter_point_value, x, already_placed, was_blank=False):
+		letter_sum, word_multiplier, cross_sum, new_tiles, rack_value = partial
+		if already_placed:
+			return (letter_sum + letter_point_value, word_multiplier, cross_sum, new_tiles, rack_value)
+
+		row = self.row_bounds
+		rack_value -= self.rack_blank_value if was_blank else letter_point_value
+		letter_point_value *= row.letter_multipliers[x]
+		cross_score = row.cross_scores[x]
+		if cross_score:
+			cross_sum += (cross_score + letter_point_value) * row.word_multipliers[x]
+		return (letter_sum + letter_point_value, word_multiplier * row.word_multipliers[x], cross_sum, new_tiles + 1, rack_value)
+
+	# Returns the score of an empty placement
+	def start_score(self):
+		return (0, 1, 0, 0, self.rack_value_sum)
+
+	# Returns the score of the placement buffer, which ends just before x. The placement is either a left
+	# part, whose squares have no tiles beside them and so no cross words, or tiles already on the board.
+	def placement_score(self, x):
+		row = self.row_bounds
+		letter_sum, word_multiplier, new_tiles, rack_value = 0, 1, 0, self.rack_value_sum
+		square_x = x - len(self.placement)
+		for move_letter in self.placement:
+			if move_letter.was_blank:
+				letter_point_value = self.blank_letter_values[ord(move_letter.letter) - ord("a")]
+			else:
+				letter_point_value = self.letter_points[move_letter.letter]
+			if move_letter.already_placed:
+				letter_sum += letter_point_value
+			else:
+				rack_value -= self.rack_blank_value if move_letter.was_blank else letter_point_value
+				letter_sum += letter_point_value * row.letter_multipliers[square_x]
+				word_multiplier *= row.word_multipliers[square_x]
+				new_tiles += 1
+			square_x += 1
+		return (letter_sum, word_multiplier, 0, new_tiles, rack_value)
+
+	# Returns an upper bound on the score of any move that carries on from the placement, with the given
+	# score, at x. The tiles placed from here on can also add no more than the value left on the rack
+	# times the best letter multiplier they can reach.
+	def score_bound(self, partial, x):
+		letter_sum, word_multiplier, cross_sum, new_tiles, rack_value = partial
+		row = self.row_bounds
+		tiles = self.rack_size - new_tiles
+		letter_sum += row.tile_sums[x][tiles] + min(row.value_sums[x][tiles], rack_value * row.top_letter_multipliers[x][tiles])
+		bound = letter_sum * word_multiplier * row.word_products[x][tiles] + cross_sum + row.cross_sums[x][tiles]
+		if new_tiles + row.squares[x][tiles] >= 7:
+			bound += self.bingo_bonus
+		return bound
+
+	# Generates the moves in the direction along the line. While best_moves is searching, row_bounds has
+	# to be set to the RowBounds of the line.
+	def AlgorithmRow(self, direction, line):
+		self.set_line(direction, line)
 
-	def AlgorithmHorizontal(self):
 		# Check if empty board
 		if self.board_is_blank:
-			x, y = int(self.width/2), int(self.height/2)
+			# The only anchor is the center square
+			if line != int(self.line_count(direction)/2):
+				return
+			x = int(self.line_length/2)
 
 			# Calculate the limit as whichever is the shortest, the size of the rack or distance from edge
 			if x < len(self.current_rack) - 1:
@@ -217,229 +878,454 @@ class Game:
 			else:
 				limit = len(self.current_rack) - 1
 
-			self.LeftPart("", self.dictionary.get_root(), limit, (x, y), Move())
+			self.stats.anchors += 1
+			self.search_anchor(limit, x)
 
 			return 
 
-		# Loop through rows
-		for j in range(self.height):
-			# Get anchors to use in the algorithm
-			anchors = self.get_anchors(j)
-
-			# Set previous anchor value to the left edge - 1 (seems to work)
-			previous_anchor_x_value = -1
-			
-			# Loop through anchors
-			for anchor in anchors:
-				# Check if anchor is directly to the right of a tile. If so, call ExtendRight directly
-				if anchor[0] > 0:
-					if self.board[anchor[0] - 1][j].tile:
-						move = Move()
-
-						# If so, get the prefix directly
-						prefix = ""
-						left_index = anchor[0] - 1
-						while (left_index >= 0 and self.board[left_index][j].tile):
-							prefix = self.board[left_index][j].tile + prefix
-
-							# Prepend letter to Move indicating that it is already a tile
-							move.letters.insert(0, MoveLetter(self.board[left_index][j].tile, True))
-
-							left_index -= 1
-
-						self.print_debug_statement("Anchor is {} and is to the right of a tile, with a prefix of {}".format(anchor, prefix))
-
-						# Get the node at the end of the prefix if it exists
-						prefix_node = self.dictionary.attempt_trace_prefix(prefix)
-
-						# Check if the prefix starts a word
-						if prefix_node:
-							self.print_debug_statement("The prefix starts a word!")
-							self.ExtendRight(prefix, prefix_node, anchor, move)
-						else:
-							self.print_debug_statement("The prefix does not start a word")
-
-						# Update previous anchor x value
-						previous_anchor_x_value = anchor[0]
-						continue
-
-				# This means there is an empty tile to the left of the anchor
-
-				dist_from_last_anchor = anchor[0] - previous_anchor_x_value -1
-				# Calculate the limit as whichever is the shortest, the size of the rack or distance from
-				# 	last anchor
-				if dist_from_last_anchor < len(self.current_rack) - 1:
-					limit = dist_from_last_anchor
-				else:
-					limit = len(self.current_rack) - 1
-				self.print_debug_statement("Anchor is {} with limit of {}".format(anchor, limit))
+		# Get anchors to use in the algorithm
+		anchors = self.get_anchors()
+		line_tiles = self.line_tiles
+
+		# Set previous anchor value to the left edge - 1 (seems to work)
+		previous_anchor_x_value = -1
+
+		self.stats.anchors += len(anchors)
+
+		# Loop through anchors
+		for anchor in anchors:
+			# Check if anchor is directly to the right of a tile. If so, call ExtendRight directly
+			# from the end of the tile run's prefix.
+			if anchor > 0 and line_tiles[anchor - 1]:
+				run = self.get_tile_runs().get(anchor)
+				if run is not None:
+					prefix_node, prefix_letters = run
+					if self.debug:
+						self.trace("Anchor is {} and is to the right of a tile, with a prefix of {}", self.line_coords(anchor), "".join(ML.letter for ML in prefix_letters))
+					# Start the placement with the prefix, indicating that its letters are already tiles
+					self.placement = list(prefix_letters)
+					self.ExtendRight(prefix_node, anchor)
+					self.placement = []
+				elif self.debug:
+					self.trace("Anchor is {} and is to the right of tiles that do not start a word", self.line_coords(anchor))
 
-				self.print_debug_statement("The partial words are:")
-				self.LeftPart("", self.dictionary.get_root(), limit, anchor, Move())
 				# Update previous anchor x value
-				previous_anchor_x_value = anchor[0]
+				previous_anchor_x_value = anchor
+				continue
 
-	def LeftPart(self, PartialWord, cur_node, limit, anchor, move):
-		self.print_debug_statement(PartialWord)
-		self.ExtendRight(PartialWord, cur_node, anchor, deepcopy(move))
+			# This means there is an empty tile to the left of the anchor
+
+			dist_from_last_anchor = anchor - previous_anchor_x_value -1
+			# Calculate the limit as whichever is the shortest, the size of the rack or distance from
+			# 	last anchor
+			if dist_from_last_anchor < len(self.current_rack) - 1:
+				limit = dist_from_last_anchor
+			else:
+				limit = len(self.current_rack) - 1
+			if self.debug:
+				self.trace("Anchor is {} with limit of {}", self.line_coords(anchor), limit)
+				self.trace("The partial words are:")
+			self.search_anchor(limit, anchor)
+			# Update previous anchor x value
+			previous_anchor_x_value = anchor
+
+	# Searches the moves through the empty anchor at position anchor along the line, with a left part
+	# of up to limit letters. While best_moves is searching, the anchor is skipped if no move starting
+	# within limit squares of it can reach the best score found so far.
+	def search_anchor(self, limit, anchor):
+		# A move through an empty square needs a tile from the rack, and with none limit is -1, which
+		# leaves no start to bound
+		if not self.current_rack:
+			return
+		if self.pruning:
+			start_partial = self.start_score()
+			if max(self.score_bound(start_partial, x) for x in range(anchor - limit, anchor + 1)) < self.best_score:
+				self.stats.pruned_branches += 1
+				return
+		self.LeftPart(self.dictionary.get_root(), limit, anchor)
+
+	# Returns the letters of the placement buffer as a string, for debugging
+	def partial_word(self):
+		return "".join([ML.letter for ML in self.placement])
+
+	def LeftPart(self, cur_node, limit, anchor):
+		stats = self.stats
+		stats.nodes_visited += 1
+		stats.left_parts += 1
+		if self.debug:
+			self.trace(self.partial_word())
+		self.ExtendRight(cur_node, anchor)
 		if limit > 0:
-			for letter, next_node in cur_node.edges.items():
-				# Check if the letter is in the current rack 
-				if letter in self.current_rack:
-					self.current_rack.remove(letter)
-					# Add letter to move and indicate that it was not already a tile
-					move.letters.append(MoveLetter(letter, False))
-					self.LeftPart(PartialWord + letter, next_node, limit-1, anchor, deepcopy(move))
-					self.current_rack.append(letter)
-					# Remove letter from move
-					move.letters.pop()
-
-				# Check if there is a blank in the current rack
-				#     - The reason why this is another if statement is that we want both cases
-				#		when we could use a letter or a blank, in order to account for various
-				#		scores
-				if BLANK in self.current_rack:
-					self.current_rack.remove(BLANK)
-					# Add letter to move and indicate that it was not already a tile and was a blank
-					move.letters.append(MoveLetter(letter, False, True))
-					self.LeftPart(PartialWord + letter, next_node, limit-1, anchor, deepcopy(move))
-					self.current_rack.append(BLANK)
-					# Remove letter from move
-					move.letters.pop()
-
-
-	def ExtendRight(self, PartialWord, cur_node, coords, move):
-		self.print_debug_statement("Current partial word is: {} at {}".format(PartialWord, coords))
-		self.print_debug_statement("Current rack is: {}".format(self.current_rack))
-
-		x, y = coords[0], coords[1]
+			placement = self.placement
+			# Letters that continue the prefix and can be played from the rack, either as themselves or
+			# as a blank
+			candidates = self.lexicon.child_mask(cur_node)
+			if not self.rack_blanks:
+				candidates &= self.rack_mask
+			while candidates:
+				bit = candidates & -candidates
+				candidates ^= bit
+				index = bit.bit_length() - 1
+				next_node = self.lexicon.child(cur_node, ascii_lowercase[index])
+
+				# Check if the letter is in the current rack
+				if self.rack_mask & bit:
+					self.take_letter(index)
+					# Add letter to the placement and indicate that it was not already a tile
+					placement.append(RACK_MOVE_LETTERS[index])
+					self.LeftPart(next_node, limit-1, anchor)
+					self.return_letter(index)
+					# Remove letter from the placement
+					placement.pop()
+
+				# Check if there is a blank in the current rack. When the letter is on the rack too, the
+				# blank only needs trying if every blank assignment is wanted (see assign_blanks).
+				if self.rack_blanks and (not self.rack_mask & bit or self.all_blank_assignments):
+					self.rack_blanks -= 1
+					# Add letter to the placement and indicate that it was not already a tile and was a blank
+					placement.append(BLANK_MOVE_LETTERS[index])
+					self.LeftPart(next_node, limit-1, anchor)
+					self.rack_blanks += 1
+					# Remove letter from the placement
+					placement.pop()
+
+	# Extends the placement with the square at position x along the line. partial is the score of the
+	# placement while best_moves is searching, and None otherwise. It is worked out from the placement
+	# when the search first reaches ExtendRight.
+	def ExtendRight(self, cur_node, x, partial=None):
+		self.stats.nodes_visited += 1
+		debug = self.debug
+		if debug:
+			self.trace("Current partial word is: {} at {}", self.partial_word(), self.line_coords(x))
 
 		# Check if we have reached the edge. If so, return
-		if x >= self.width:
-			self.print_debug_statement("\tReached the edge!")
+		if x >= self.line_length:
+			if debug:
+				self.trace("\tReached the edge!")
 			return
 
+		if self.pruning:
+			if partial is None:
+				partial = self.placement_score(x)
+			# Ties are still searched, so that every best move is found
+			if self.score_bound(partial, x) < self.best_score:
+				self.stats.pruned_branches += 1
+				return
+
+		placement = self.placement
+		line_tiles = self.line_tiles
+
 		# Check if we have landed on a tile
-		if not self.board[x][y].tile:
-			self.print_debug_statement("\tNot a tile!")
-			self.print_debug_statement("\tChecking each letter")
-			# Check each possible letter to continue the word
-			for letter, next_node in cur_node.edges.items():
-				self.print_debug_statement("\tChecking: {}".format(letter))
+		if not line_tiles[x]:
+			if debug:
+				self.trace("\tNot a tile!")
+			# Check if either the tile to the right is empty or we hit the edge, which is needed for
+			# a word ending here to be a legal move
+			ends_word = x == self.line_length - 1 or not line_tiles[x + 1]
+
+			# The letters that continue the word, fit across the line and can be played from the rack,
+			# either as themselves or as a blank
+			candidates = self.lexicon.child_mask(cur_node) & self.line_cross_checks[x]
+			if not self.rack_blanks:
+				candidates &= self.rack_mask
+			while candidates:
+				bit = candidates & -candidates
+				candidates ^= bit
+				index = bit.bit_length() - 1
+				next_node = self.lexicon.child(cur_node, ascii_lowercase[index])
+				next_is_final = ends_word and self.lexicon.is_final(next_node, self.lexicon_mask)
+
 				# Check if possible letter is in our rack
-				if letter in self.current_rack: 
-					self.print_debug_statement("\t\t{} is in the rack".format(letter))
-					# Check if possible letter fits vertically
-					if letter in self.board[x][y].v_cross_checks:
-						self.print_debug_statement("\t\t{} is in vertical cross checks.".format(letter))
-						# Add letter to move and indicate that it was not already a tile
-						move.letters.append(MoveLetter(letter, False))
-
-						# Check if we have reached a compelete word in the dictionary
-						if next_node.final:
-							# Check if either the tile to the right is empty or we hit the edge
-							if (x < self.width - 1 and not self.board[x + 1][y].tile) or x == self.width - 1:
-								self.print_debug_statement("\t\tThe next node is final, meaning our partial word is a word")
-								# We have a legal move! Call legal move with a deepcopy of the move
-								self.LegalMove(PartialWord + letter, coords, deepcopy(move))
-
-						# Take the letter off the rack, recursively call ExtendRight with the added letter,
-						# and then add the letter back to the rack for continued testing
-						self.current_rack.remove(letter)
-						self.ExtendRight(PartialWord + letter, next_node, (x + 1, y), deepcopy(move))
-						self.current_rack.append(letter)
-
-						# Remove letter from move for continued testing
-						move.letters.pop()
+				if self.rack_mask & bit:
+					# Add letter to the placement and indicate that it was not already a tile
+					placement.append(RACK_MOVE_LETTERS[index])
+
+					# Check if we have reached a compelete word in the dictionary
+					if next_is_final:
+						if debug:
+							self.trace("\t\tThe next node is final, meaning our partial word is a word")
+						# We have a legal move!
+						self.LegalMove(x)
+
+					# Take the letter off the rack, recursively call ExtendRight with the added letter,
+					# and then add the letter back to the rack for continued testing
+					self.take_letter(index)
+					if partial is None:
+						self.ExtendRight(next_node, x + 1)
 					else:
-						self.print_debug_statement("\t\t{} is not in vertical cross checks".format(letter))
-				else:
-					self.print_debug_statement("\t\t{} is not in the rack".format(letter))
-
-				if BLANK in self.current_rack: 
-					self.print_debug_statement("There is a blank in the rack")
-					# Check if possible letter fits vertically
-					if letter in self.board[x][y].v_cross_checks:
-						self.print_debug_statement("\t\t{} is in vertical cross checks.".format(letter))
-						# Add letter to move and indicate that it was not already a tile and was a blank
-						move.letters.append(MoveLetter(letter, False, True))
-
-						# Check if we have reached a compelete word in the dictionary
-						if next_node.final:
-							# Check if either the tile to the right is empty or we hit the edge
-							if (x < self.width - 1 and not self.board[x + 1][y].tile) or x == self.width - 1:
-								self.print_debug_statement("\t\tThe next node is final, meaning our partial word is a word")
-								# We have a legal move! Call legal move with a deepcopy of the move
-								self.LegalMove(PartialWord + letter, coords, deepcopy(move))
-
-						# Take the letter off the rack, recursively call ExtendRight with the added letter,
-						# and then add the letter back to the rack for continued testing
-						self.current_rack.remove(BLANK)
-						self.ExtendRight(PartialWord + letter, next_node, (x + 1, y), deepcopy(move))
-						self.current_rack.append(BLANK)
-
-						# Remove letter from move for continued testing
-						move.letters.pop()
+						self.ExtendRight(next_node, x + 1, self.add_letter_score(partial, self.letter_points[ascii_lowercase[index]], x, False))
+					self.return_letter(index)
+
+					# Remove letter from the placement for continued testing
+					placement.pop()
+
+				if self.rack_blanks and (not self.rack_mask & bit or self.all_blank_assignments):
+					# Add letter to the placement and indicate that it was not already a tile and was a blank
+					placement.append(BLANK_MOVE_LETTERS[index])
+
+					# Check if we have reached a compelete word in the dictionary
+					if next_is_final:
+						if debug:
+							self.trace("\t\tThe next node is final, meaning our partial word is a word")
+						# We have a legal move!
+						self.LegalMove(x)
+
+					# Take the blank off the rack, recursively call ExtendRight with the added letter,
+					# and then add the blank back to the rack for continued testing
+					self.rack_blanks -= 1
+					if partial is None:
+						self.ExtendRight(next_node, x + 1)
 					else:
-						self.print_debug_statement("\t\t{} is not in vertical cross checks".format(letter))
-				else:
-					self.print_debug_statement("There is no blank in the rack".format(letter))
+						self.ExtendRight(next_node, x + 1, self.add_letter_score(partial, self.blank_letter_values[index], x, False, True))
+					self.rack_blanks += 1
+
+					# Remove letter from the placement for continued testing
+					placement.pop()
 		else:
-			self.print_debug_statement("\tIs the tile of: {}".format(self.board[x][y].tile))
 			# If we have landed on a tile, check if the letter can be used in a word
-			cur_tile = self.board[x][y].tile
-			if cur_tile in cur_node.edges.keys():
-				# Add letter to move and indicate that it was a tile
-				move.letters.append(MoveLetter(cur_tile, True))
+			cur_tile = line_tiles[x]
+			next_node = self.lexicon.child(cur_node, cur_tile)
+			if next_node is not None:
+				# Add letter to the placement and indicate that it was a tile
+				placement.append(BOARD_MOVE_LETTERS[cur_tile])
 
-				self.print_debug_statement("\t\tAdded tile makes a prefix.")
 				# Check if we have reached a compelete word in the dictionary
-				if cur_node.edges[cur_tile].final:
+				if self.lexicon.is_final(next_node, self.lexicon_mask):
 					# Check if either the tile to the right is empty or we hit the edge
-					if (x < self.width - 1 and not self.board[x + 1][y].tile) or x == self.width - 1:
-						self.print_debug_statement("\t\tThe next node is final, meaning our partial word is a word")
-					    # We have a legal move! Call legal move with a deepcopy of the move
-						self.LegalMove(PartialWord + cur_tile, coords, deepcopy(move))
+					if (x < self.line_length - 1 and not line_tiles[x + 1]) or x == self.line_length - 1:
+						if debug:
+							self.trace("\t\tThe next node is final, meaning our partial word is a word")
+						# We have a legal move!
+						self.LegalMove(x)
 
 				# Recursively call ExtendRight with the added letter
-				self.ExtendRight(PartialWord + cur_tile, cur_node.edges[cur_tile], (x + 1, y), deepcopy(move))
-			else:
-				self.print_debug_statement("\tAdded tile does not make a prefix")
-
-	def LegalMove(self, PartialWord, coords, move):
-
-		coords = (coords[0] - len(PartialWord) + 1, coords[1])
+				if partial is None:
+					self.ExtendRight(next_node, x + 1)
+				else:
+					self.ExtendRight(next_node, x + 1, self.add_letter_score(partial, self.letter_points[cur_tile], x, True))
+
+				# Remove letter from the placement
+				placement.pop()
+			elif debug:
+				self.trace("\tAdded tile does not make a prefix")
+
+	def GaddagAlgorithmRow(self, direction, line):
+		gaddag = self.dictionary.get_gaddag()
+		self.set_line(direction, line)
+		# The letters of the move being searched, by position along the line. The search plays letters
+		# outwards from the anchor in both directions, so they are written where they go rather than
+		# pushed onto the placement list, and the word is the slice between its two ends.
+		self.line_placement = [None] * self.line_length
+
+		# Check if empty board, in which case the only anchor is the center square
+		if self.board_is_blank:
+			if line == int(self.line_count(direction)/2):
+				anchor = int(self.line_length/2)
+				self.stats.anchors += 1
+				self.GaddagGen(gaddag, anchor, set(), anchor, gaddag.root, anchor)
+			return
 
-		if self.transposed:
-			# If transposed, switch the x and y coords
-			coords = (coords[1], coords[0])
+		anchors = self.get_anchors()
+		anchor_xs = set(anchors)
+		self.stats.anchors += len(anchors)
+		for anchor in anchors:
+			if self.debug:
+				self.trace("Generating from anchor {}", self.line_coords(anchor))
+			self.GaddagGen(gaddag, anchor, anchor_xs, anchor, gaddag.root, anchor)
+
+	# Plays the square at x, which is either the anchor or a square reached by moving outwards from it,
+	# with the tile already there or each letter from the rack that continues a GADDAG path. Each letter
+	# is written to the line placement, the move is recorded if it makes a word, and the search carries
+	# on leftwards, or rightwards once the left end of the word is fixed. left is the left end of the
+	# word so far. Positions are along the current line.
+	def GaddagGen(self, gaddag, anchor, anchor_xs, x, cur_node, left):
+		self.stats.nodes_visited += 1
+		line_tiles = self.line_tiles
+		line_placement = self.line_placement
+		last = self.line_length - 1
+
+		# Where the word lies with a letter at x, whether it is a legal move if the path ends there, and
+		# where the search goes next, which only depend on the square
+		if x <= anchor:
+			# Moving left, so the word covers x up to the anchor, and it is a move if nothing touches
+			# either end once the whole reversed word has been read
+			left_is_empty = x == 0 or not line_tiles[x - 1]
+			start, end = x, anchor
+			ends_word = left_is_empty and (anchor == last or not line_tiles[anchor + 1])
+			# Keep moving left. An empty anchor stops the word, since moves covering it are generated
+			# from that anchor.
+			go_left = x > 0 and (not left_is_empty or x - 1 not in anchor_xs)
+			# Or fix the left end of the word here and start moving right from the anchor
+			turn = left_is_empty and anchor < last
+			go_right = False
+		else:
+			# Moving right, so the word covers left up to x
+			start, end = left, x
+			ends_word = x == last or not line_tiles[x + 1]
+			go_left = turn = False
+			go_right = x < last
+
+		cur_tile = line_tiles[x]
+		if cur_tile:
+			next_node = gaddag.child(cur_node, cur_tile)
+			if next_node is not None:
+				line_placement[x] = BOARD_MOVE_LETTERS[cur_tile]
+				if ends_word and gaddag.is_final(next_node, self.lexicon_mask):
+					self.LegalMove(end, tuple(line_placement[start:end + 1]))
+				if go_left:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x - 1, next_node, x - 1)
+				if turn:
+					separator_node = gaddag.child(next_node, GADDAG_SEPARATOR)
+					if separator_node is not None:
+						self.GaddagGen(gaddag, anchor, anchor_xs, anchor + 1, separator_node, x)
+				if go_right:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x + 1, next_node, left)
+			return
 
-			move.direction = "downwards"
-			move.start_coords = coords
+		# The letters that continue a path, fit across the line and can be played from the rack, either
+		# as themselves or as a blank
+		candidates = gaddag.child_mask(cur_node) & self.line_cross_checks[x]
+		if not self.rack_blanks:
+			candidates &= self.rack_mask
+		while candidates:
+			bit = candidates & -candidates
+			candidates ^= bit
+			index = bit.bit_length() - 1
+			next_node = gaddag.child(cur_node, ascii_lowercase[index])
+			is_move = ends_word and gaddag.is_final(next_node, self.lexicon_mask)
+			separator_node = gaddag.child(next_node, GADDAG_SEPARATOR) if turn else None
+
+			if self.rack_mask & bit:
+				line_placement[x] = RACK_MOVE_LETTERS[index]
+				if is_move:
+					self.LegalMove(end, tuple(line_placement[start:end + 1]))
+				self.take_letter(index)
+				if go_left:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x - 1, next_node, x - 1)
+				if separator_node is not None:
+					self.GaddagGen(gaddag, anchor, anchor_xs, anchor + 1, separator_node, x)
+				if go_right:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x + 1, next_node, left)
+				self.return_letter(index)
+
+			if self.rack_blanks and (not self.rack_mask & bit or self.all_blank_assignments):
+				line_placement[x] = BLANK_MOVE_LETTERS[index]
+				if is_move:
+					self.LegalMove(end, tuple(line_placement[start:end + 1]))
+				self.rack_blanks -= 1
+				if go_left:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x - 1, next_node, x - 1)
+				if separator_node is not None:
+					self.GaddagGen(gaddag, anchor, anchor_xs, anchor + 1, separator_node, x)
+				if go_right:
+					self.GaddagGen(gaddag, anchor, anchor_xs, x + 1, next_node, left)
+				self.rack_blanks += 1
+				line_placement[x] = None
+
+	# Take a letter off of, and put it back on, the rack count vector
+	def take_letter(self, index):
+		self.rack_counts[index] -= 1
+		if not self.rack_counts[index]:
+			self.rack_mask &= ~(1 << index)
+
+	def return_letter(self, index):
+		self.rack_counts[index] += 1
+		self.rack_mask |= 1 << index
+
+	# Records the placement as a legal move, given the position of its last letter along the current line,
+	# or the letters given instead of the placement
+	def LegalMove(self, x, letters=None):
+		if letters is None:
+			letters = tuple(self.placement)
+		start = x - len(letters) + 1
+
+		# A move of one tile that makes a word across is found across, so it is left out downwards
+		if self.direction == DOWNWARDS:
+			new_tiles = [i for i, move_letter in enumerate(letters) if not move_letter.already_placed]
+			if len(new_tiles) == 1:
+				tile_x, tile_y = self.line_coords(start + new_tiles[0])
+				row = self.row_occupancy[tile_y]
+				if (row << 1 | row >> 1) >> tile_x & 1:
+					return
+
+		self.stats.legal_moves += 1
+
+		if self.rack_blank_count and not self.all_blank_assignments:
+			letters = self.assign_blanks(letters, start)
+
+		move = Move()
+		move.letters = letters
+		move.direction = self.direction
+		move.start_coords = self.line_coords(start)
+		if not self.batch_scoring or self.move_sink is not None:
 			self.score_move(move)
-			self.print_debug_statement("Score outside score_move: {}".format(move.score))
 
-			self.print_debug_statement("Legal move found by placing {} with last tile right above {}".format(PartialWord, coords))
+		if self.leave_table is not None:
+			leave_weights = self.leave_weights
+			used = 0
+			for move_letter in letters:
+				if not move_letter.already_placed:
+					used += leave_weights[BLANK if move_letter.was_blank else move_letter.letter]
+			move.leave_value = self.rack_leave_values[used]
 
-			self.possible_moves.append(move)
-		else:
-			move.direction = "across"
-			move.start_coords = coords
-			self.score_move(move)
-			self.print_debug_statement("Legal move found by placing {} with last tile to the left of {}".format(PartialWord, coords))
+		if self.debug:
+			self.trace("Legal move found by placing {} {} starting at {}", move.serialize(), move.direction, move.start_coords)
 
+		if self.move_sink is None:
 			self.possible_moves.append(move)
+		else:
+			self.move_sink(move)
+
+	# Returns the placement starting at position start along the line with its blanks moved to the
+	# copies of their letters where they cost the fewest points. A letter only needs as many blanks
+	# as it has new tiles beyond its copies on the rack. The search plays a letter from the rack
+	# before a blank for it, so it only plays a blank once the rack has run out of the letter, but
+	# the blank could have gone on any new tile of the letter. A blank on a new tile costs the
+	# letter's value times the square's weight: its letter multiplier times the word multiplier of
+	# the move, plus its own word multiplier if it makes a cross word (see score_move).
+	def assign_blanks(self, letters, start):
+		blank_letters = set(move_letter.letter for move_letter in letters if move_letter.was_blank)
+		if not blank_letters:
+			return letters
+
+		line_bonuses = self.line_bonuses
+		line_cross_scores = self.line_cross_scores
+		word_multiplier = 1
+		for i, move_letter in enumerate(letters):
+			if not move_letter.already_placed:
+				word_multiplier *= WORD_MULTIPLIERS.get(line_bonuses[start + i], 1)
+
+		def weight(i):
+			bonus = line_bonuses[start + i]
+			cross_multiplier = WORD_MULTIPLIERS.get(bonus, 1) if line_cross_scores[start + i] else 0
+			return (LETTER_MULTIPLIERS.get(bonus, 1) * (word_multiplier + cross_multiplier), i)
+
+		letters = list(letters)
+		for letter in blank_letters:
+			squares = [i for i, move_letter in enumerate(letters) if move_letter.letter == letter and not move_letter.already_placed]
+			blanks = max(len(squares) - self.current_rack.count(letter), 0)
+			index = ord(letter) - ord("a")
+			for n, i in enumerate(sorted(squares, key=weight)):
+				letters[i] = BLANK_MOVE_LETTERS[index] if n < blanks else RACK_MOVE_LETTERS[index]
+		return tuple(letters)
 
 	def score_move(self, move):
-		self.print_debug_statement("Scoring the move: {}".format(move.serialize()))
+		debug = self.debug
+		if debug:
+			self.trace("Scoring the move: {}", move.serialize())
 
 		hor_multiplier = 1
 		hor_score = 0
 
-		if self.transposed:
-			x, y = move.start_coords[1], move.start_coords[0]
-		else: 
-			x, y = move.start_coords[0], move.start_coords[1]
+		# Walk along the move, scoring the words it makes in the other direction with the cross scores
+		# for that direction
+		square = self.square_index(*move.start_coords)
+		if move.direction == ACROSS:
+			step = 1
+			cross_scores = self.v_cross_scores
+		else:
+			step = self.width
+			cross_scores = self.h_cross_scores
 
 		for move_letter in move.letters:
 			# Get the point value of the letter
@@ -447,30 +1333,24 @@ class Game:
 			# If the letter was a blank, the point value is 0
 			if move_letter.was_blank:
 				letter_point_value = 0
-			self.print_debug_statement("\tInitial letter point value of {} is: {}".format(move_letter.letter, letter_point_value))
 
 			if not move_letter.already_placed:
 				# Get the vertical score
-				v_score = self.board[x][y].v_cross_score
-				self.print_debug_statement("\t\tInitial v_score is: {}".format(v_score))
+				v_score = cross_scores[square]
 
 				# Implement bonus
-				bonus = self.board[x][y].bonus
-				self.print_debug_statement("\t\tBonus is: {}".format(bonus))
+				bonus = self.bonuses[square]
 				if bonus == DOUBLE_LETTER:
-					self.print_debug_statement("\t\tDouble letter!")
 					# Double the letter point value and then add it to the vertical score if it exists
 					letter_point_value *= 2
 					if v_score:
 						v_score += letter_point_value
 				elif bonus == TRIPLE_LETTER:
-					self.print_debug_statement("\t\tTriple letter!")
 					# Triple the letter point value and then add it to the vertical score if it exists
 					letter_point_value *= 3					
 					if v_score:
 						v_score += letter_point_value
 				elif bonus == DOUBLE_WORD:
-					self.print_debug_statement("\t\tDouble word!")
 					# Double the horizontal multiplier and then, if the vertical score exists,
 					# add the letter point value to it and then double it
 					hor_multiplier *= 2
@@ -478,34 +1358,33 @@ class Game:
 						v_score += letter_point_value
 						v_score *= 2
 				elif bonus == TRIPLE_WORD:
-					self.print_debug_statement("\t\tTriple word!")
 					# Triple the horizontal multiplier and then, if the vertical score exists,
 					# add the letter point value to it and then triple it
 					hor_multiplier *= 3
 					if v_score:
-						v_score += letter_point_valule
+						v_score += letter_point_value
 						v_score *= 3
 				else: 
 					# If there is a vertical score, add the letter point value to it
 					if v_score:
 						v_score += letter_point_value
 
-				self.print_debug_statement("\t\tFinal v_score is: {}".format(v_score))
+				if debug:
+					self.trace("\t{}: letter points {}, bonus {}, vertical score {}", move_letter.letter, letter_point_value, bonus, v_score)
 
 				# Add the finished vertical score to the total move score variable
 				move.score += v_score
-
-			self.print_debug_statement("\t\tFinal letter point value: {}".format(letter_point_value))
+			elif debug:
+				self.trace("\t{}: letter points {}, already placed", move_letter.letter, letter_point_value)
 
 			# Add the final letter point value to the horizontal score
 			hor_score += letter_point_value
 
-			# Increment the x value
-			x += 1
+			# Move on to the next square
+			square += step
 
-		self.print_debug_statement("\tSum of vertical scores is: {}".format(move.score))
-		self.print_debug_statement("\tFinal horizontal score is: {}".format(hor_score))
-		self.print_debug_statement("\tFinal horizontal multiplier is: {}".format(hor_multiplier))
+		if debug:
+			self.trace("\tSum of vertical scores is {}, horizontal score is {} with a multiplier of {}", move.score, hor_score, hor_multiplier)
 
 		# Add the horizontal score with the applied multiplier to the total move score variable
 		move.score += hor_score * hor_multiplier
@@ -514,20 +1393,96 @@ class Game:
 		if len([ml for ml in move.letters if not ml.already_placed]) == 7:
 			move.score += self.bingo_bonus
 
-		self.print_debug_statement("\tScore within score_move: {}".format(move.score))
+		if debug:
+			self.trace("\tScore within score_move: {}", move.score)
+
+	# Scores a batch of moves, giving each the score that score_move would add to a score of 0. With
+	# NumPy, the letters of every move are laid out in flat arrays, one entry per letter, with the
+	# number of the move it belongs to, and the words are scored for all of the moves at once from
+	# arrays of the board's multipliers and cross scores. Only laying out the letters goes over them one
+	# by one in Python, which is much quicker than scoring them. Without NumPy each move is scored with
+	# score_move.
+	def score_moves(self, moves):
+		if numpy is None:
+			for move in moves:
+				move.score = 0
+				self.score_move(move)
+			return
+		if not moves:
+			return
 
-	def sort_highest(self):
-		self.possible_moves.sort(key=lambda possible_move: possible_move.score, reverse=True)
+		# Lay out the letters of the moves one after the other, as codes (see MOVE_LETTER_CODES), with
+		# the length, start and direction of each move. Going over the moves once for each of these with
+		# map is quicker than one loop that does them all.
+		move_letters = list(map(attrgetter("letters"), moves))
+		lengths = numpy.fromiter(map(len, move_letters), dtype=numpy.int64, count=len(moves))
+		codes = numpy.fromiter(map(MOVE_LETTER_CODES.__getitem__, chain.from_iterable(move_letters)), dtype=numpy.int64, count=lengths.sum())
+		start_coords = numpy.fromiter(chain.from_iterable(map(attrgetter("start_coords"), moves)), dtype=numpy.int64, count=2 * len(moves)).reshape(-1, 2)
+		downwards = numpy.fromiter(map(ACROSS.__ne__, map(attrgetter("direction"), moves)), dtype=bool, count=len(moves))
+
+		# The points and whether it is a new tile, for each code
+		code_letters = list(MOVE_LETTER_CODES)
+		code_points = numpy.array([0 if move_letter.was_blank else self.letter_points[move_letter.letter] for move_letter in code_letters], dtype=numpy.int64)
+		code_new = numpy.array([not move_letter.already_placed for move_letter in code_letters], dtype=bool)
+
+		# The move, square, points and direction of every letter
+		width = self.width
+		move_ids = numpy.repeat(numpy.arange(len(moves)), lengths)
+		firsts = numpy.cumsum(lengths) - lengths
+		positions = numpy.arange(len(codes)) - firsts[move_ids]
+		starts = start_coords[:, 1] * width + start_coords[:, 0]
+		steps = numpy.where(downwards, width, 1)
+		squares = starts[move_ids] + positions * steps[move_ids]
+		letter_points = code_points[codes]
+		new = code_new[codes]
+
+		# Multipliers only count under new tiles. Moves across make cross words with the v cross scores
+		# and moves downwards with the h ones.
+		bonuses = self.bonuses
+		letter_multipliers = numpy.array([LETTER_MULTIPLIERS.get(bonus, 1) for bonus in bonuses], dtype=numpy.int64)
+		word_multipliers = numpy.array([WORD_MULTIPLIERS.get(bonus, 1) for bonus in bonuses], dtype=numpy.int64)
+		cross_scores = numpy.array([self.v_cross_scores, self.h_cross_scores], dtype=numpy.int64)
+		letter_values = letter_points * numpy.where(new, letter_multipliers[squares], 1)
+		letter_word_multipliers = numpy.where(new, word_multipliers[squares], 1)
+		letter_cross_scores = numpy.where(new, cross_scores[downwards[move_ids].astype(numpy.int64), squares], 0)
+
+		# Sums per move, from bincount's float sums, which are exact for integers this small
+		def per_move(weights):
+			return numpy.bincount(move_ids, weights=weights, minlength=len(moves)).round().astype(numpy.int64)
+
+		# The main word's letter sum times the product of its word multipliers, which is 2 to the
+		# number of double word squares times 3 to the number of triple word squares
+		word_products = 2 ** per_move(letter_word_multipliers == 2) * 3 ** per_move(letter_word_multipliers == 3)
+		scores = per_move(letter_values) * word_products
+		# Each cross word: its other letters plus the new letter's value, times the new letter's word
+		# multiplier
+		scores += per_move(numpy.where(letter_cross_scores != 0, (letter_cross_scores + letter_values) * letter_word_multipliers, 0))
+		scores += numpy.where(per_move(new) == 7, self.bingo_bonus, 0)
+
+		for move, score in zip(moves, scores.tolist()):
+			move.score = score
+
+	# Sorts the moves by score, or by score plus leave value with by_equity
+	def sort_highest(self, by_equity=False):
+		with self.stats.timer("sort"):
+			if by_equity:
+				self.possible_moves.sort(key=lambda possible_move: possible_move.equity(), reverse=True)
+			else:
+				self.possible_moves.sort(key=lambda possible_move: possible_move.score, reverse=True)
 
-	def return_highest(self):
-		self.sort_highest()
+	def return_highest(self, by_equity=False):
+		self.sort_highest(by_equity)
 		
 		if not self.possible_moves:
 			return None
 
+		if by_equity:
+			high_equity = self.possible_moves[0].equity()
+			return [move for move in self.possible_moves if move.equity() == high_equity]
+
 		high_score = self.possible_moves[0].score
 		i = 0
-		while(self.possible_moves[i].score == high_score):
+		while(i < len(self.possible_moves) and self.possible_moves[i].score == high_score):
 			i += 1
 
 		return self.possible_moves[:i]
@@ -554,16 +1509,86 @@ class Game:
 				move.print()
 
 	def test_ExtendRight(self, PartialWord, coords):
-		self.ExtendRight(PartialWord, self.dictionary.get_root(), coords, Move())
+		# The partial word is placed to the left of coords as if it were already on the board
+		prefix_node = self.dictionary.attempt_trace_prefix(PartialWord)
+		if prefix_node is not None:
+			self.placement = [BOARD_MOVE_LETTERS[letter] for letter in PartialWord]
+			self.set_line(ACROSS, coords[1])
+			self.ExtendRight(prefix_node, coords[0])
+			self.placement = []
 
 	def test_LeftPart(self, limit, coords):
-		self.LeftPart("", self.dictionary.get_root(), limit, coords, Move())
+		self.set_line(ACROSS, coords[1])
+		self.LeftPart(self.dictionary.get_root(), limit, coords[0])
 
-	def print_debug_statement(self, text):
+	# Prints a line of the debugging trace, formatting the message with args only when debugging. In the
+	# search, calls are also guarded by self.debug, so that the arguments are not even worked out otherwise.
+	def trace(self, message, *args):
 		if self.debug:
-			print(text)
+			print(message.format(*args) if args else message)
 
 	def print_possible_words(self):
 		print("{} possible moves:".format(len(self.possible_moves)))
 		for possible_move in self.possible_moves:
 			possible_move.print()
+
+
+# Class to define a long lived solver that loads the dictionary once and reuses it for every
+# position, so that solving a position only does the per position work of creating the board,
+# evaluating cross checks and running the algorithm
+class Solver:
+
+	def __init__(self, height, width, bonus_placements, letter_points, bingo_bonus, dictionary_file, debug=False, leave_file=None, cache=None):
+		self.dictionary = Dictionary(dictionary_file)
+		self.debug = debug
+		# Gives every move the value of its leave, when a leave table built with leaves.py is given
+		self.leave_table = LeaveTable(leave_file) if leave_file else None
+		# The MoveCache of the moves of positions solved before, if any (see position_cache)
+		self.cache = cache
+
+		self.height = height
+		self.width = width
+		self.bonus_placements = bonus_placements
+		self.letter_points = letter_points
+		self.bingo_bonus = bingo_bonus
+
+		# The SearchStats of the last position solved
+		self.stats = None
+
+	# lexicons selects the lexicons of the dictionary whose words can be played (see Game.lexicon_mask)
+	def new_game(self, placed_tiles, current_rack, lexicons=None):
+		# The rack is copied because the algorithm takes tiles off of it while searching
+		return Game(self.height, self.width, placed_tiles, self.bonus_placements, self.letter_points, list(current_rack),
+			self.bingo_bonus, None, debug=self.debug, dictionary=self.dictionary, leave_table=self.leave_table, lexicons=lexicons)
+
+	# Returns every move for the position, or only the top highest scoring ones if top is given, or
+	# only the moves that tie for the highest score, found with the branch and bound search, if best is
+	# set. Each placement of letters is only given its highest scoring blank assignment, unless
+	# all_blanks is set. With by_equity the top moves are those with the highest score plus leave value.
+	# Only the words of the lexicons named by lexicons are played, or of every lexicon if it is None.
+	# With a cache, a position solved the same way before is answered from it without creating its
+	# game, and the stats are left empty.
+	def solve(self, placed_tiles, current_rack, top=None, engine=DAWG_ENGINE, best=False, all_blanks=False, by_equity=False, lexicons=None):
+		key = None
+		if self.cache is not None:
+			key = cache_key(position_hash(self.height, self.width, placed_tiles, self.bonus_placements, self.letter_points, self.bingo_bonus, current_rack),
+				search_options(top, engine, best, by_equity), self.dictionary, self.dictionary.lexicon_mask(lexicons), all_blanks, self.leave_table)
+			moves = self.cache.get(key)
+			if moves is not None:
+				self.stats = SearchStats()
+				return moves
+
+		game = self.new_game(placed_tiles, current_rack, lexicons)
+		game.all_blank_assignments = all_blanks
+		self.stats = game.stats
+		if best:
+			moves = game.best_moves()
+		elif top is not None:
+			moves = game.top_moves(top, engine, by_equity)
+		else:
+			game.Algorithm(engine)
+			moves = game.possible_moves
+
+		if key is not None:
+			self.cache.put(key, moves)
+		return moves
@@ -0,0 +1,206 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Monte Carlo simulation of the candidate moves for a position. The tiles that the player cannot see,
+# those in the bag and on the opponent's rack, are worked out from the tile distribution, the board
+# and the player's rack. Each rollout plays a candidate, shuffles the unseen tiles into a bag, draws
+# the opponent's rack and the player's new tiles from it, and plays the game forward for a number of
+# plies, each side playing its highest scoring move. The equity of a candidate is the average over
+# its rollouts of the points it scores plus the player's points minus the opponent's points in the
+# plies after it.
+#
+# Rollout i draws from the same shuffle for every candidate, so that the candidates are compared on
+# the same racks, and the rollouts can be shared out to a pool of worker processes without changing
+# the results.
+#
+# Usage: python simulation.py [position.json] [--candidates K] [--rollouts N] [--plies P] [--workers W]
+#	[--seed S] [--dictionary file]
+#
+# where position.json holds one position in the format read by batch_solver.py. Without it the
+# benchmark position is simulated.
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, namedtuple
+
+from helper_lists import *
+
+# The equity of a candidate move: the average and standard deviation of the point spread of its
+# rollouts, highest equity first in the results of simulate
+SimulationResult = namedtuple("SimulationResult", ["move", "equity", "stdev", "rollouts"])
+
+# The position being simulated by the worker processes (see simulate)
+worker_simulation = None
+
+# A bag of tiles to draw from, in random order
+class TileBag:
+	def __init__(self, tiles, rng=None):
+		self.tiles = list(tiles)
+		(rng or random).shuffle(self.tiles)
+
+	# Returns the full distribution of tiles, by default the standard English set
+	@classmethod
+	def full(cls, distribution=SCRABBLE_TILE_DISTRIBUTION, rng=None):
+		return cls([tile for tile, number in sorted(distribution.items()) for _ in range(number)], rng)
+
+	# Takes up to n tiles out of the bag
+	def draw(self, n):
+		n = min(n, len(self.tiles))
+		drawn = self.tiles[len(self.tiles) - n:]
+		del self.tiles[len(self.tiles) - n:]
+		return drawn
+
+	def __len__(self):
+		return len(self.tiles)
+
+# Returns the tiles that are neither on the board nor on the rack, in sorted order. The board only
+# records letters, so a letter beyond its count in the distribution is taken to be a blank.
+def unseen_tiles(game, rack, distribution=SCRABBLE_TILE_DISTRIBUTION):
+	counts = Counter(distribution)
+	for tile in [tile for tile in game.tiles if tile] + list(rack):
+		if counts[tile] > 0:
+			counts[tile] -= 1
+		else:
+			counts[BLANK] -= 1
+	if counts[BLANK] < 0:
+		raise ValueError("The board and rack hold more tiles than the distribution")
+	return sorted(counts.elements())
+
+# Returns the tiles left on the rack after playing a move
+def rack_leave(rack, move):
+	leave = list(rack)
+	for move_letter in move.letters:
+		if not move_letter.already_placed:
+			leave.remove(BLANK if move_letter.was_blank else move_letter.letter)
+	return leave
+
+# Plays a rollout of the candidate move from the position and returns the point spread for the player.
+# The game is not changed.
+def rollout(game, rack, move, unseen, plies, seed):
+	rng = random.Random(seed)
+	game = game.copy()
+	bag = TileBag(unseen, rng)
+
+	game.apply_move(move)
+	spread = move.score
+
+	# The opponent's rack is drawn before the player's new tiles, so that it does not depend on how
+	# many tiles the candidate used
+	racks = [bag.draw(SCRABBLE_RACK_SIZE), None]
+	player_rack = rack_leave(rack, move)
+	racks[1] = player_rack + bag.draw(SCRABBLE_RACK_SIZE - len(player_rack))
+	if not player_rack and not racks[1]:
+		# The candidate played out the last tiles
+		return spread
+
+	for ply in range(plies):
+		turn = ply % 2
+		game.set_rack(racks[turn])
+		moves = game.best_moves()
+		if not moves:
+			# Nothing can be played, so the turn is passed
+			continue
+
+		best = moves[0]
+		game.apply_move(best)
+		spread += best.score if turn else -best.score
+		leave = rack_leave(racks[turn], best)
+		racks[turn] = leave + bag.draw(SCRABBLE_RACK_SIZE - len(leave))
+		if not racks[turn]:
+			# Out of tiles, which ends the game
+			break
+
+	return spread
+
+# Returns the seed of rollout i, shared by every candidate
+def rollout_seed(seed, i):
+	return seed * 1000003 + i
+
+# Runs the rollouts of one candidate given by a work unit of (candidate index, first rollout, number
+# of rollouts) in a worker process, and returns the candidate index and the spreads
+def run_rollouts(work_unit):
+	candidate, first, number = work_unit
+	game, rack, candidates, unseen, plies, seed = worker_simulation
+	return candidate, [rollout(game, rack, candidates[candidate], unseen, plies, rollout_seed(seed, i)) for i in range(first, first + number)]
+
+# Simulates the top candidates highest scoring moves of the game for its current rack with rollouts
+# of plies moves each, and returns a SimulationResult for each candidate, highest equity first. With
+# more than one worker the rollouts are run in a pool of forked worker processes.
+def simulate(game, candidates=10, rollouts=100, plies=2, workers=1, seed=0, unseen=None):
+	global worker_simulation
+
+	rack = list(game.current_rack)
+	moves = game.top_moves(candidates)
+	if unseen is None:
+		unseen = unseen_tiles(game, rack)
+
+	worker_simulation = (game, rack, moves, unseen, plies, seed)
+	try:
+		# Each candidate's rollouts are split into a few work units, so that the workers finish
+		# together
+		chunk = max(1, rollouts // (workers * 4)) if workers > 1 else rollouts
+		work_units = [(candidate, first, min(chunk, rollouts - first)) for candidate in range(len(moves)) for first in range(0, rollouts, chunk)]
+
+		spreads = [[] for move in moves]
+		if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+			with multiprocessing.get_context("fork").Pool(workers) as pool:
+				for candidate, candidate_spreads in pool.imap(run_rollouts, work_units):
+					spreads[candidate].extend(candidate_spreads)
+		else:
+			for work_unit in work_units:
+				candidate, candidate_spreads = run_rollouts(work_unit)
+				spreads[candidate].extend(candidate_spreads)
+	finally:
+		worker_simulation = None
+
+	results = []
+	for move, candidate_spreads in zip(moves, spreads):
+		stdev = statistics.stdev(candidate_spreads) if len(candidate_spreads) > 1 else 0.0
+		results.append(SimulationResult(move, sum(candidate_spreads) / len(candidate_spreads), stdev, len(candidate_spreads)))
+	# Sorting is stable, so candidates with the same equity stay in score order
+	results.sort(key=lambda result: result.equity, reverse=True)
+	return results
+
+if __name__ == "__main__":
+	import json
+
+	from batch_solver import position_game
+	from benchmark import new_game
+	from solver_helper_classes import Dictionary
+
+	parser = argparse.ArgumentParser(description="Rank the candidate moves of a scrabble position by simulation")
+	parser.add_argument("position", nargs="?", help="position as a JSON object, in the format read by batch_solver.py (default: the benchmark position)")
+	parser.add_argument("--candidates", type=int, default=10, help="number of highest scoring moves to simulate")
+	parser.add_argument("--rollouts", type=int, default=100, help="number of rollouts of each candidate")
+	parser.add_argument("--plies", type=int, default=2, help="number of moves played after each candidate")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--dictionary", help="word list or compiled dawg (default: {} if it exists, else {})".format(COMPILED_DICTIONARY, DICTIONARY))
+	args = parser.parse_args()
+
+	dictionary_file = args.dictionary
+	if dictionary_file is None:
+		dictionary_file = COMPILED_DICTIONARY if os.path.exists(COMPILED_DICTIONARY) else DICTIONARY
+	dictionary = Dictionary(dictionary_file)
+
+	if args.position:
+		game = position_game(json.load(open(args.position, "rt")), dictionary)
+	else:
+		game = new_game(dictionary)
+
+	start = time.perf_counter()
+	results = simulate(game, args.candidates, args.rollouts, args.plies, args.workers, args.seed)
+	seconds = time.perf_counter() - start
+
+	print("candidate            score  equity   stdev")
+	for result in results:
+		move = result.move
+		print("{:<20} {:>5}  {:>6.1f}  {:>6.1f}".format("{} {} {}".format(move.serialize(), move.direction, move.start_coords), move.score, result.equity, result.stdev))
+
+	total = sum(result.rollouts for result in results)
+	print("{} rollouts of {} plies in {:.2f} s ({:.1f} rollouts/s) with {} workers".format(total, args.plies, seconds, total / seconds if seconds else 0, args.workers), file=sys.stderr)
@@ -5,23 +5,17 @@
 #
 # Uses dawg implementation by Steve Hanov at http://stevehanov.ca/blog/?id=115
 
-from dawg import *
-
-# Class to define a square on the baord
-class Square:
-	def __init__(self, tile, bonus):
-		self.tile = tile
-		self.bonus = bonus
-		self.v_cross_checks = set()
-		self.h_cross_checks = set()
-		self.v_cross_score = 0
-		self.h_cross_score = 0
-
-	def switch_cross_checks(self):
-		self.h_cross_checks, self.v_cross_checks = self.v_cross_checks, self.h_cross_checks
+import hashlib
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 
-	def switch_cross_scores(self):
-		self.h_cross_score, self.v_cross_score = self.v_cross_score, self.h_cross_score
+from dawg import *
+from compiled_dawg import CompiledDawg, is_compiled_dawg
+from flat_dawg import FlatDawg, MAX_LEXICONS
+from gaddag import build_masked_gaddag, dawg_entries
+from helper_lists import DEFAULT_LEXICON
+from word_lists import WordListReader, merge_lexicons
 
 # Class to define a single move
 class Move:
@@ -30,6 +24,8 @@ class Move:
 		self.score = 0
 		self.direction = None
 		self.start_coords = None
+		# The value of the tiles the move leaves on the rack, when the game has a leave table
+		self.leave_value = 0.0
 
 	def print(self):
 		string = "".join([ML.letter for ML in self.letters])
@@ -38,50 +34,165 @@ class Move:
 	def serialize(self):
 		return "".join([ML.letter for ML in self.letters])
 
-# Class to define a letter in a single move
-class MoveLetter:
-	def __init__(self, letter, already_placed, was_blank=False):
-		self.letter = letter
-		self.already_placed = already_placed
-		self.was_blank = was_blank
+	# The score of the move plus the value of its leave
+	def equity(self):
+		return self.score + self.leave_value
+
+# Counts of the work done by the move generator of a Game and the wall clock time spent in each phase
+# of solving, kept up to date as the game searches (see Game.stats). The counters are plain attributes
+# so that the search can bump them cheaply.
+class SearchStats:
+	COUNTERS = ("nodes_visited", "anchors", "left_parts", "legal_moves", "pruned_branches")
+
+	def __init__(self):
+		# Dawg (or GADDAG) nodes the search stepped to, anchors searched from, left parts tried,
+		# legal moves recorded and branches cut off by the score bound of best_moves
+		self.nodes_visited = 0
+		self.anchors = 0
+		self.left_parts = 0
+		self.legal_moves = 0
+		self.pruned_branches = 0
+
+		# Seconds spent in each phase, by name
+		self.phase_seconds = {}
+
+	# Adds the time spent in the with block to the phase
+	@contextmanager
+	def timer(self, phase):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + time.perf_counter() - start
+
+	# Adds the counts and times of other stats, such as those of a worker process, to these
+	def add(self, other):
+		for name in self.COUNTERS:
+			setattr(self, name, getattr(self, name) + getattr(other, name))
+		for phase, seconds in other.phase_seconds.items():
+			self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+	def as_dict(self):
+		result = {name: getattr(self, name) for name in self.COUNTERS}
+		result["seconds"] = dict(self.phase_seconds)
+		return result
+
+	def __str__(self):
+		counts = ", ".join("{} {}".format(getattr(self, name), name.replace("_", " ")) for name in self.COUNTERS)
+		times = ", ".join("{} {:.3f} s".format(phase, seconds) for phase, seconds in self.phase_seconds.items())
+		return "{}; {}".format(counts, times) if times else counts
 
-# Class to define a dictionary
+# Class to define a letter in a single move. It is immutable, so the move generator shares one
+# instance for each way of placing each letter between all of the moves it finds.
+MoveLetter = namedtuple("MoveLetter", ["letter", "already_placed", "was_blank"], defaults=[False])
+
+# Class to define a dictionary. One dawg can serve several lexicons, such as word lists of different
+# countries that share most of their words: each word's final node holds the bitset of the lexicons
+# that have it, bit i for lexicon_names[i], and a game only accepts the words of the lexicons it
+# selects (see lexicon_mask).
 class Dictionary(object):
-	def __init__(self, dictionary_file):
-		self.dawg = Dawg()
-		self.import_dictionary(dictionary_file)
-
-	def import_dictionary(self, dictionary_file):
-
-		WordCount = 0
-		words = open(dictionary_file, "rt").read().split()
-		words.sort()
-		start = time.time()    
-		for word in words:
-		    WordCount += 1
-		    # insert all words, using the reversed version as the data associated with
-		    # it
-		    self.dawg.insert(word, ''.join(reversed(word)))
-		    if ( WordCount % 100 ) == 0: print("{0}\r".format(WordCount), end="")
-		self.dawg.finish()
-		print("Dawg creation took {0} s".format(time.time()-start))
+	def __init__(self, dictionary_file, flat=False, gaddag_file=None):
+		# A compiled dawg is memory mapped as is. A word list, or a list of word lists, is built into a
+		# new dawg of one lexicon, and a dict from lexicon names to word lists (or lists of them) into a
+		# dawg of those lexicons.
+		if isinstance(dictionary_file, str) and is_compiled_dawg(dictionary_file):
+			self.dawg = CompiledDawg(dictionary_file)
+			self.lexicon_names = self.dawg.lexicon_names
+		else:
+			if isinstance(dictionary_file, dict):
+				self.import_lexicons(dictionary_file)
+			else:
+				self.import_dictionary(dictionary_file)
+			# Optionally replace the node objects with the compact array representation
+			if flat:
+				self.dawg = FlatDawg.from_dawg(self.dawg)
+
+		# A hash of the lexicons, worked out the first time it is needed (see fingerprint)
+		self.dawg_fingerprint = None
+
+		# The GADDAG used by the GADDAG move generator, loaded from gaddag_file if one is given or
+		# built from the dawg the first time it is needed
+		self.gaddag = None
+		if gaddag_file:
+			self.gaddag = CompiledDawg(gaddag_file)
+			if self.gaddag.lexicon_names != self.lexicon_names:
+				raise ValueError("{} has the lexicons {}, but the dictionary has {}".format(gaddag_file, self.gaddag.lexicon_names, self.lexicon_names))
+
+	# Builds the dawg from one word list or a list of them, plain or gzipped. The words are streamed
+	# into the dawg in sorted order without reading the lists into memory (see WordListReader).
+	def import_dictionary(self, dictionary_files):
+		self.import_lexicons({DEFAULT_LEXICON: dictionary_files})
+
+	# Builds the dawg from a dict of lexicon names to their word lists. The sorted words of the
+	# lexicons are merged, so every word is inserted once with the bitset of its lexicons.
+	def import_lexicons(self, lexicons):
+		if not 0 < len(lexicons) <= MAX_LEXICONS:
+			raise ValueError("A dictionary has from 1 to {} lexicons, not {}".format(MAX_LEXICONS, len(lexicons)))
+		self.lexicon_names = list(lexicons)
+		self.word_lists = [WordListReader(paths) for paths in lexicons.values()]
+		# insert all words, using the reversed version as the data associated with it
+		self.dawg, self.build_stats = build_masked_dawg(merge_lexicons(self.word_lists), lambda word: word[::-1])
+		for name, word_lists in zip(self.lexicon_names, self.word_lists):
+			print("{}: {}".format(name, word_lists) if len(self.word_lists) > 1 else word_lists)
+		print(self.build_stats)
+
+	# Returns the bitset of the lexicons with the given names, a name or a list of them, or of every
+	# lexicon if names is None
+	def lexicon_mask(self, names=None):
+		if names is None:
+			return (1 << len(self.lexicon_names)) - 1
+		if isinstance(names, str):
+			names = [names]
+		mask = 0
+		for name in names:
+			if name not in self.lexicon_names:
+				raise ValueError("Unknown lexicon {}, expected one of {}".format(name, ", ".join(self.lexicon_names)))
+			mask |= 1 << self.lexicon_names.index(name)
+		return mask
+
+	# Returns a hash of the lexicons' names and words, which tells dictionaries apart in the keys of a
+	# move cache (see position_cache). A compiled dawg is hashed as its file, which holds its lexicon
+	# names, and any other dawg by its words and their lexicon bitsets, so the same words compiled and
+	# built from a list hash differently, which only costs a cache miss.
+	def fingerprint(self):
+		if self.dawg_fingerprint is None:
+			digest = hashlib.blake2b(digest_size=16)
+			if isinstance(self.dawg, CompiledDawg):
+				digest.update(self.dawg.mmap)
+			else:
+				digest.update("\n".join(self.lexicon_names).encode())
+				for word, lexicons in dawg_entries(self.dawg):
+					digest.update("\n{} {}".format(word, lexicons).encode())
+			self.dawg_fingerprint = digest.hexdigest()
+		return self.dawg_fingerprint
+
+	def get_gaddag(self):
+		if self.gaddag is None:
+			self.gaddag, stats = build_masked_gaddag(dawg_entries(self.dawg))
+			print(stats)
+		return self.gaddag
+
+	# Returns a lexicon of the words spelled backwards, or None if there is none. The strings of a GADDAG
+	# that have no separator are exactly the reversed words, so a GADDAG that has been loaded or built
+	# doubles as one.
+	def get_reversed_lexicon(self):
+		return self.gaddag
 
 	def get_root(self):
 		return self.dawg.root
 
-	def check_word(self, word):
-		return self.dawg.lookup(word)
+	# Whether word is in any of the lexicons in the bitset lexicons (see lexicon_mask)
+	def check_word(self, word, lexicons=-1):
+		return self.dawg.contains(word, lexicons)
 
 	def attempt_trace_prefix(self, prefix):
 		cur_node = self.dawg.root
 		for char in prefix:
 			# Check if the prefix so far is the start of any word
-			if char not in cur_node.edges.keys():
-				# If not, return False to say that the prefix does not start any words
-				return False
-			else:
-				# Othwise, continue following the prefix
-				cur_node = cur_node.edges[char]
+			cur_node = self.dawg.child(cur_node, char)
+			if cur_node is None:
+				# If not, return None to say that the prefix does not start any words
+				return None
 
 		# At the very end, we return the node at the end of the prefix
 		return cur_node
\ No newline at end of file
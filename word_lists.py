@@ -0,0 +1,198 @@
+# !/usr/bin/python3
+# Released to the public domain.
+#
+# Streams the words of one or more word lists, plain or gzipped, in sorted order with each word once,
+# as build_dawg needs them, without holding the lists in memory. Words are read a line at a time and
+# normalized: lowercased, and left out unless they are only the letters a to z. About chunk_words
+# words are gathered at a time, sorted and written to a temporary run file without repeats, and the
+# runs are merged, dropping the copies of a word that were in more than one run. A word list has its words
+# separated by whitespace, while a phrase list has an entry per line whose spaces, hyphens and
+# apostrophes are taken out, so "ice-cream" and "ice cream" both become "icecream".
+#
+# Usage: python word_lists.py <word list>... [--phrases phrase list]... [--chunk-words N] [--output file]
+#
+# writes the merged words, one per line, to the output file or stdout, and reports the counts, time and
+# peak memory on stderr.
+
+import argparse
+import gzip
+import heapq
+import os
+import sys
+import tempfile
+
+from dawg import peak_memory
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Words sorted in memory at a time, before they are written out as a run
+DEFAULT_CHUNK_WORDS = 500000
+
+# Bytes of a list read and normalized at a time
+BATCH_BYTES = 1 << 16
+
+# Characters taken out of the entries of a phrase list
+PHRASE_SEPARATORS = str.maketrans("", "", " -'")
+
+def is_gzip(path):
+	with open(path, "rb") as f:
+		return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+# Opens a word list as text, decompressing it if it is gzipped. Bytes that are not UTF-8 are replaced,
+# which leaves the entries holding them out.
+def open_word_list(path):
+	if is_gzip(path):
+		return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+	return open(path, "rt", encoding="utf-8", errors="replace")
+
+# Returns the word for an entry of a word list, or None if it is not a word that can be played
+def normalize_word(entry):
+	word = entry.lower()
+	return word if word.isascii() and word.isalpha() else None
+
+# Yields the words of a sorted iterable of words, leaving out repeats
+def distinct(words):
+	previous = None
+	for word in words:
+		if word != previous:
+			yield word
+			previous = word
+
+# The words of a set of word and phrase lists. Iterating over it yields the words in sorted order, each
+# once, and leaves the counts of what was read in its attributes.
+class WordListReader:
+	def __init__(self, paths=(), phrase_paths=(), chunk_words=DEFAULT_CHUNK_WORDS, temp_dir=None):
+		self.paths = [paths] if isinstance(paths, str) else list(paths)
+		self.phrase_paths = [phrase_paths] if isinstance(phrase_paths, str) else list(phrase_paths)
+		# None sorts every word in memory at once
+		self.chunk_words = chunk_words
+		self.temp_dir = temp_dir
+
+		# Entries read, entries left out by normalize_word, distinct words yielded and runs written
+		self.entries = 0
+		self.rejected = 0
+		self.words = 0
+		self.runs = 0
+
+	# Yields the normalized words of every list in the order they are read, in batches of the words in
+	# about BATCH_BYTES of a list, which are normalized together much faster than one at a time
+	def normalized_batches(self):
+		for path, phrases in [(path, False) for path in self.paths] + [(path, True) for path in self.phrase_paths]:
+			with open_word_list(path) as f:
+				for lines in iter(lambda: f.readlines(BATCH_BYTES), []):
+					text = "".join(lines).lower()
+					if phrases:
+						entries = [entry.strip() for entry in text.translate(PHRASE_SEPARATORS).split("\n")]
+						entries = [entry for entry in entries if entry]
+					else:
+						entries = text.split()
+					# The words that normalize_word would keep
+					words = [word for word in entries if word.isascii() and word.isalpha()]
+					self.entries += len(entries)
+					self.rejected += len(entries) - len(words)
+					yield words
+
+	# Writes a sorted run of words to a new file in directory and returns its path
+	def write_run(self, words, directory):
+		path = os.path.join(directory, "run{}.txt".format(self.runs))
+		with open(path, "wt", encoding="ascii") as f:
+			f.writelines(word + "\n" for word in distinct(words))
+		self.runs += 1
+		return path
+
+	def __iter__(self):
+		self.entries = self.rejected = self.words = self.runs = 0
+
+		with tempfile.TemporaryDirectory(dir=self.temp_dir) as directory:
+			# The words are sorted as a list rather than gathered in a set, since word lists are often
+			# sorted already, which a list sorts much faster
+			run_paths = []
+			chunk = []
+			for words in self.normalized_batches():
+				chunk.extend(words)
+				if self.chunk_words is not None and len(chunk) >= self.chunk_words:
+					chunk.sort()
+					run_paths.append(self.write_run(chunk, directory))
+					chunk = []
+
+			chunk.sort()
+			# Everything fitted in one chunk, so there is nothing to merge
+			if not run_paths:
+				for word in distinct(chunk):
+					self.words += 1
+					yield word
+				return
+
+			if chunk:
+				run_paths.append(self.write_run(chunk, directory))
+			chunk = None
+
+			runs = [open(path, "rt", encoding="ascii") for path in run_paths]
+			try:
+				for word in distinct(heapq.merge(*((line[:-1] for line in run) for run in runs))):
+					self.words += 1
+					yield word
+			finally:
+				for run in runs:
+					run.close()
+
+	def duplicates(self):
+		return self.entries - self.rejected - self.words
+
+	def __str__(self):
+		return ("Read {} entries from {} lists: {} words, {} duplicates, {} left out, {} sorted runs".format(
+			self.entries, len(self.paths) + len(self.phrase_paths), self.words, self.duplicates(), self.rejected, self.runs))
+
+# Yields the words of a word stream paired with bit
+def tag_words(words, bit):
+	for word in words:
+		yield word, bit
+
+# Yields every word of some sorted streams of distinct words, such as WordListReaders, in sorted order
+# with the bitset of the streams that hold it, bit i for stream i
+def merge_lexicons(word_streams):
+	word, lexicons = None, 0
+	for next_word, bit in heapq.merge(*(tag_words(words, 1 << i) for i, words in enumerate(word_streams))):
+		if next_word != word:
+			if word is not None:
+				yield word, lexicons
+			word, lexicons = next_word, 0
+		lexicons |= bit
+	if word is not None:
+		yield word, lexicons
+
+# Returns the word lists named on a command line, where each argument is a word list or name=list for
+# a list of the named lexicon, as a list of word lists, or a dict from lexicon names to their word lists
+# if any are named
+def parse_word_list_args(args):
+	if not any("=" in arg for arg in args):
+		return list(args)
+	lexicons = {}
+	for arg in args:
+		name, separator, path = arg.partition("=")
+		if not separator or not name:
+			raise ValueError("Expected <lexicon name>=<word list>, not {}".format(arg))
+		lexicons.setdefault(name, []).append(path)
+	return lexicons
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Merge word lists into one sorted list of distinct words")
+	parser.add_argument("paths", nargs="*", metavar="word list", help="word list, plain or gzipped, with words separated by whitespace")
+	parser.add_argument("--phrases", action="append", default=[], metavar="phrase list", help="phrase list, plain or gzipped, with an entry per line")
+	parser.add_argument("--chunk-words", type=int, default=DEFAULT_CHUNK_WORDS, help="words to sort in memory at a time")
+	parser.add_argument("--output", help="where to write the words (default: stdout)")
+	args = parser.parse_args()
+
+	if not args.paths and not args.phrases:
+		parser.error("no word lists given")
+
+	reader = WordListReader(args.paths, args.phrases, args.chunk_words)
+	output = open(args.output, "wt") if args.output else sys.stdout
+	for word in reader:
+		output.write(word + "\n")
+	output.flush()
+
+	print(reader, file=sys.stderr)
+	peak = peak_memory()
+	if peak is not None:
+		print("Peak memory {:.1f} MB".format(peak / 2**20), file=sys.stderr)